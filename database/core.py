@@ -1,6 +1,10 @@
 from __future__ import annotations
 
+import asyncio
+import atexit
 import sqlite3
+import threading
+import time
 from contextlib import contextmanager
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
@@ -8,6 +12,32 @@ from typing import Any, Dict, Iterable, Iterator, List, Optional
 
 DB_PATH = Path("data") / "bot.db"
 
+_connection: Optional[sqlite3.Connection] = None
+_connection_lock = threading.Lock()
+
+# Keep executemany batches comfortably small for SQLite.
+_BULK_CHUNK_SIZE = 500
+
+# Hot-path SQL kept as module constants so the driver's prepared-statement
+# cache keys on a stable string literal.
+_SQL_UPSERT_USER = """
+    INSERT INTO users (user_id, username, first_name, join_date, last_active)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(user_id) DO UPDATE SET
+        username=excluded.username,
+        first_name=excluded.first_name,
+        last_active=excluded.last_active
+"""
+_SQL_UPDATE_LAST_ACTIVE = "UPDATE users SET last_active = ? WHERE user_id = ?"
+_SQL_INCREMENT_DOWNLOADS = (
+    "UPDATE users SET downloads_count = downloads_count + ? WHERE user_id = ?"
+)
+_SQL_SET_SETTING = (
+    "INSERT INTO settings (key, value) VALUES (?, ?) "
+    "ON CONFLICT(key) DO UPDATE SET value = excluded.value"
+)
+_SQL_ADD_LOG = "INSERT INTO logs (user_id, action, created_at) VALUES (?, ?, ?)"
+
 DEFAULT_SETTINGS: Dict[str, str] = {
     "start_text": (
         "Assalomu alaykum! Bu bot orqali Instagram va TikTok videolarini tez va sifatli yuklab olishingiz mumkin."
@@ -24,31 +54,33 @@ DEFAULT_SETTINGS: Dict[str, str] = {
 
 def ensure_database() -> None:
     """Create required database and tables if they do not exist."""
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with sqlite3.connect(DB_PATH) as connection:
-        cursor = connection.cursor()
-        cursor.executescript(
-            """
-            PRAGMA journal_mode=WAL;
+    _get_shared_connection()
+
 
+def _initialize_database(connection: sqlite3.Connection) -> None:
+    cursor = connection.cursor()
+    cursor.executescript(
+            """
             CREATE TABLE IF NOT EXISTS users (
                 user_id INTEGER PRIMARY KEY,
                 username TEXT,
                 first_name TEXT,
                 join_date TEXT,
                 last_active TEXT,
-                downloads_count INTEGER DEFAULT 0
+                downloads_count INTEGER DEFAULT 0,
+                subs_verified_until INTEGER DEFAULT 0,
+                subs_verified_hash TEXT
             );
 
             CREATE TABLE IF NOT EXISTS admins (
                 user_id INTEGER PRIMARY KEY,
                 username TEXT,
-                can_manage_users INTEGER DEFAULT 1,
-                can_manage_channels INTEGER DEFAULT 1,
-                can_broadcast INTEGER DEFAULT 1,
-                can_view_stats INTEGER DEFAULT 1,
-                can_manage_admins INTEGER DEFAULT 0
-            );
+                can_manage_users INTEGER NOT NULL DEFAULT 1,
+                can_manage_channels INTEGER NOT NULL DEFAULT 1,
+                can_broadcast INTEGER NOT NULL DEFAULT 1,
+                can_view_stats INTEGER NOT NULL DEFAULT 1,
+                can_manage_admins INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID;
 
             CREATE TABLE IF NOT EXISTS channels (
                 channel_id TEXT PRIMARY KEY,
@@ -57,111 +89,261 @@ def ensure_database() -> None:
             );
 
             CREATE TABLE IF NOT EXISTS settings (
-                key TEXT PRIMARY KEY,
+                key TEXT NOT NULL PRIMARY KEY,
                 value TEXT
-            );
+            ) WITHOUT ROWID;
 
             CREATE TABLE IF NOT EXISTS logs (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 user_id INTEGER,
                 action TEXT,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+                created_at TEXT NOT NULL
             );
+
+            CREATE TABLE IF NOT EXISTS channel_members (
+                channel_id TEXT NOT NULL,
+                user_id INTEGER NOT NULL,
+                is_member INTEGER NOT NULL,
+                PRIMARY KEY (channel_id, user_id)
+            ) WITHOUT ROWID;
+
+            CREATE INDEX IF NOT EXISTS idx_users_last_active ON users(last_active);
+            CREATE INDEX IF NOT EXISTS idx_users_join_date ON users(join_date);
+            CREATE INDEX IF NOT EXISTS idx_users_downloads
+                ON users(downloads_count DESC) WHERE downloads_count > 0;
+            CREATE INDEX IF NOT EXISTS idx_logs_created_at ON logs(created_at DESC);
             """
-        )
-        _migrate_admin_permissions(connection)
-        _populate_default_settings(connection)
+    )
+    _migrate_to_without_rowid(connection)
+    _ensure_user_columns(connection)
+    _populate_default_settings(connection)
+    cursor.execute("ANALYZE")
+
+
+_WITHOUT_ROWID_SCHEMAS = {
+    "settings": (
+        "CREATE TABLE settings ("
+        " key TEXT NOT NULL PRIMARY KEY,"
+        " value TEXT"
+        ") WITHOUT ROWID"
+    ),
+    "admins": (
+        "CREATE TABLE admins ("
+        " user_id INTEGER PRIMARY KEY,"
+        " username TEXT,"
+        " can_manage_users INTEGER NOT NULL DEFAULT 1,"
+        " can_manage_channels INTEGER NOT NULL DEFAULT 1,"
+        " can_broadcast INTEGER NOT NULL DEFAULT 1,"
+        " can_view_stats INTEGER NOT NULL DEFAULT 1,"
+        " can_manage_admins INTEGER NOT NULL DEFAULT 0"
+        ") WITHOUT ROWID"
+    ),
+}
 
 
-def _migrate_admin_permissions(connection: sqlite3.Connection) -> None:
-    """Add admin permission columns if they don't exist (migration)."""
-    cursor = connection.cursor()
-    cursor.execute("PRAGMA table_info(admins)")
-    columns = [row[1] for row in cursor.fetchall()]
-    
-    permission_columns = [
-        ("can_manage_users", "INTEGER DEFAULT 1"),
-        ("can_manage_channels", "INTEGER DEFAULT 1"),
-        ("can_broadcast", "INTEGER DEFAULT 1"),
-        ("can_view_stats", "INTEGER DEFAULT 1"),
-        ("can_manage_admins", "INTEGER DEFAULT 0"),
-    ]
-    
-    for column_name, column_type in permission_columns:
-        if column_name not in columns:
-            cursor.execute(f"ALTER TABLE admins ADD COLUMN {column_name} {column_type}")
-    
-    connection.commit()
+def _migrate_to_without_rowid(connection: sqlite3.Connection) -> None:
+    """Rebuild small PK-lookup tables as WITHOUT ROWID (one-shot migration).
+
+    Databases created before this schema change keep their rowid tables;
+    copy the rows into the clustered layout once and drop the old table.
+    """
+    for table, create_sql in _WITHOUT_ROWID_SCHEMAS.items():
+        row = connection.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (table,),
+        ).fetchone()
+        if row is None or "WITHOUT ROWID" in (row["sql"] or "").upper():
+            continue
+        columns = [
+            info[1] for info in connection.execute(f"PRAGMA table_info({table})")
+        ]
+        column_list = ", ".join(columns)
+        with connection:
+            connection.execute(f"ALTER TABLE {table} RENAME TO {table}_rowid_old")
+            connection.execute(create_sql)
+            connection.execute(
+                f"INSERT INTO {table} ({column_list}) "
+                f"SELECT {column_list} FROM {table}_rowid_old"
+            )
+            connection.execute(f"DROP TABLE {table}_rowid_old")
+
+
+def _ensure_user_columns(connection: sqlite3.Connection) -> None:
+    """Add columns introduced after release to pre-existing users tables."""
+    columns = {info[1] for info in connection.execute("PRAGMA table_info(users)")}
+    with connection:
+        if "subs_verified_until" not in columns:
+            connection.execute(
+                "ALTER TABLE users ADD COLUMN subs_verified_until INTEGER DEFAULT 0"
+            )
+        if "subs_verified_hash" not in columns:
+            connection.execute("ALTER TABLE users ADD COLUMN subs_verified_hash TEXT")
+
+
+def _apply_pragmas(connection: sqlite3.Connection) -> None:
+    """Tune the shared connection once instead of per reconnect.
+
+    ``auto_vacuum`` only takes effect for databases created after it is
+    set; deployments with a pre-existing database and heavy log deletes
+    should run ``PRAGMA incremental_vacuum`` during maintenance.
+    """
+    connection.executescript(
+        """
+        PRAGMA auto_vacuum=INCREMENTAL;
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA cache_size=-65536;
+        PRAGMA mmap_size=268435456;
+        PRAGMA foreign_keys=ON;
+        """
+    )
+
+
+def _get_shared_connection() -> sqlite3.Connection:
+    """Lazily create the process-wide SQLite connection (double-checked lock)."""
+    global _connection
+    if _connection is None:
+        with _connection_lock:
+            if _connection is None:
+                DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+                connection = sqlite3.connect(
+                    DB_PATH,
+                    check_same_thread=False,
+                    cached_statements=256,
+                )
+                connection.row_factory = sqlite3.Row
+                _apply_pragmas(connection)
+                _initialize_database(connection)
+                atexit.register(_optimize_on_exit, connection)
+                _connection = connection
+    return _connection
+
+
+def _optimize_on_exit(connection: sqlite3.Connection) -> None:
+    """Refresh planner statistics before the process exits."""
+    try:
+        connection.execute("PRAGMA optimize")
+        connection.close()
+    except sqlite3.Error:
+        pass
 
 
 @contextmanager
 def get_connection() -> Iterator[sqlite3.Connection]:
-    """Provide a context-managed connection to the SQLite database."""
-    ensure_database()
-    connection = sqlite3.connect(DB_PATH)
-    connection.row_factory = sqlite3.Row
-    try:
+    """Provide the shared connection to the SQLite database.
+
+    The connection is opened once per process and never closed by callers;
+    sqlite3 serializes statement execution across threads internally.
+    """
+    yield _get_shared_connection()
+
+
+@contextmanager
+def batch() -> Iterator[sqlite3.Connection]:
+    """Group many writes into one transaction (single commit at exit).
+
+    Callers issuing N statements in a loop should wrap the loop in
+    ``with batch() as connection:`` to avoid paying one fsync per write.
+    """
+    connection = _get_shared_connection()
+    with connection:
         yield connection
-    finally:
-        connection.close()
 
 
-def _now_iso() -> str:
-    return datetime.now(timezone.utc).isoformat()
+def _now_iso(now: Optional[datetime] = None) -> str:
+    return (now or datetime.now(timezone.utc)).isoformat()
 
 
 def _populate_default_settings(connection: sqlite3.Connection) -> None:
-    cursor = connection.cursor()
-    for key, value in DEFAULT_SETTINGS.items():
-        cursor.execute(
+    with connection:
+        connection.executemany(
             "INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)",
-            (key, value),
+            DEFAULT_SETTINGS.items(),
         )
-    connection.commit()
 
 
 # --------------------------- User management --------------------------- #
 
 
 def add_or_update_user(user_id: int, username: Optional[str], first_name: Optional[str]) -> None:
+    now = _now_iso()
     with get_connection() as connection:
-        connection.execute(
-            """
-            INSERT INTO users (user_id, username, first_name, join_date, last_active)
-            VALUES (?, ?, ?, ?, ?)
-            ON CONFLICT(user_id) DO UPDATE SET
-                username=excluded.username,
-                first_name=excluded.first_name,
-                last_active=excluded.last_active
-            """,
-            (user_id, username, first_name, _now_iso(), _now_iso()),
-        )
-        connection.commit()
+        with connection:
+            connection.execute(
+                _SQL_UPSERT_USER,
+                (user_id, username, first_name, now, now),
+            )
+
+
+def add_or_update_users_bulk(
+    users: Iterable[tuple[int, Optional[str], Optional[str]]],
+) -> None:
+    """Upsert many users inside a single transaction."""
+    now = _now_iso()
+    rows = [
+        (user_id, username, first_name, now, now)
+        for user_id, username, first_name in users
+    ]
+    if not rows:
+        return
+    with get_connection() as connection:
+        with connection:
+            for start in range(0, len(rows), _BULK_CHUNK_SIZE):
+                connection.executemany(
+                    _SQL_UPSERT_USER,
+                    rows[start:start + _BULK_CHUNK_SIZE],
+                )
 
 
 def update_last_active(user_id: int) -> None:
     with get_connection() as connection:
-        connection.execute(
-            "UPDATE users SET last_active = ? WHERE user_id = ?",
-            (_now_iso(), user_id),
-        )
-        connection.commit()
+        with connection:
+            connection.execute(_SQL_UPDATE_LAST_ACTIVE, (_now_iso(), user_id))
 
 
 def increment_downloads(user_id: int, count: int = 1) -> None:
     with get_connection() as connection:
-        connection.execute(
-            "UPDATE users SET downloads_count = downloads_count + ? WHERE user_id = ?",
-            (count, user_id),
-        )
-        connection.commit()
+        with connection:
+            connection.execute(_SQL_INCREMENT_DOWNLOADS, (count, user_id))
 
 
-def iter_user_ids() -> Iterator[int]:
+def get_subs_verification(user_id: int) -> Optional[tuple[int, Optional[str]]]:
+    """Return (verified_until, channels_hash) of the last positive check."""
+    with get_connection() as connection:
+        row = connection.execute(
+            "SELECT subs_verified_until, subs_verified_hash FROM users WHERE user_id = ?",
+            (user_id,),
+        ).fetchone()
+    if row is None:
+        return None
+    return int(row["subs_verified_until"] or 0), row["subs_verified_hash"]
+
+
+def set_subs_verified(user_id: int, until: int, channels_hash: str) -> None:
+    with get_connection() as connection:
+        with connection:
+            connection.execute(
+                "UPDATE users SET subs_verified_until = ?, subs_verified_hash = ? "
+                "WHERE user_id = ?",
+                (until, channels_hash, user_id),
+            )
+
+
+def count_users() -> int:
+    """Cheap COUNT(*) used for progress totals without materializing ids."""
+    with get_connection() as connection:
+        return connection.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+
+def iter_user_ids(batch_size: int = 1000) -> Iterator[int]:
+    """Stream user ids straight from the cursor without materializing them."""
     with get_connection() as connection:
         cursor = connection.execute("SELECT user_id FROM users")
-        for row in cursor.fetchall():
-            yield row["user_id"]
+        cursor.row_factory = None  # plain tuples: skip Row allocation per id
+        cursor.arraysize = batch_size
+        for (user_id,) in cursor:
+            yield user_id
 
 
 def get_user_counts() -> Dict[str, int]:
@@ -174,7 +356,7 @@ def get_user_counts() -> Dict[str, int]:
         for label, delta in {"today": 1, "week": 7, "month": 30}.items():
             threshold = (today - timedelta(days=delta - 1)).isoformat()
             result = connection.execute(
-                "SELECT COUNT(*) AS c FROM users WHERE DATE(last_active) >= ?",
+                "SELECT COUNT(*) AS c FROM users WHERE last_active >= ?",
                 (threshold,),
             ).fetchone()
             metrics[label] = result["c"]
@@ -193,10 +375,12 @@ def get_user_counts() -> Dict[str, int]:
 
 
 def get_users_join_dates(limit_days: int = 30) -> List[Dict[str, Any]]:
+    """Return a per-day histogram of new users instead of one row per user."""
     threshold = (datetime.now(timezone.utc) - timedelta(days=limit_days)).isoformat()
     with get_connection() as connection:
         cursor = connection.execute(
-            "SELECT DATE(join_date) AS join_day FROM users WHERE join_date >= ?",
+            "SELECT DATE(join_date) AS join_day, COUNT(*) AS count FROM users "
+            "WHERE join_date >= ? GROUP BY join_day",
             (threshold,),
         )
         return [dict(row) for row in cursor.fetchall()]
@@ -210,7 +394,7 @@ def get_monthly_active_users(limit: int = 50) -> List[Dict[str, Any]]:
             SELECT user_id, username, first_name, last_active, downloads_count
             FROM users
             WHERE last_active >= ?
-            ORDER BY datetime(last_active) DESC
+            ORDER BY last_active DESC
             LIMIT ?
             """,
             (threshold, limit),
@@ -222,7 +406,14 @@ def get_detailed_statistics() -> Dict[str, Any]:
     """Return comprehensive statistics for admin panel."""
     with get_connection() as connection:
         today = datetime.now(timezone.utc)
-        
+        # Day-bucket labels, newest first, computed once for every block below.
+        day_strings = [
+            (today - timedelta(days=days_back)).date().isoformat()
+            for days_back in range(30)
+        ]
+        today_str = day_strings[0]
+        tomorrow_str = (today.date() + timedelta(days=1)).isoformat()
+
         # Basic counts
         basic_stats = connection.execute("SELECT COUNT(*) AS total FROM users").fetchone()
         total_users = basic_stats["total"]
@@ -234,72 +425,80 @@ def get_detailed_statistics() -> Dict[str, Any]:
             "FROM users WHERE downloads_count > 0"
         ).fetchone()
         
-        # Daily activity for the last 30 days
-        daily_activity = {}
-        for days_back in range(30):
-            date = (today - timedelta(days=days_back)).date().isoformat()
-            count = connection.execute(
-                "SELECT COUNT(*) AS c FROM users WHERE DATE(last_active) = ?",
-                (date,)
-            ).fetchone()["c"]
-            daily_activity[date] = count
-        
-        # Hourly activity for today
-        hourly_activity = {}
-        today_str = today.date().isoformat()
-        for hour in range(24):
-            hour_start = f"{today_str} {hour:02d}:00:00"
-            hour_end = f"{today_str} {hour:02d}:59:59"
-            count = connection.execute(
-                "SELECT COUNT(*) AS c FROM users WHERE last_active BETWEEN ? AND ?",
-                (hour_start, hour_end)
-            ).fetchone()["c"]
-            hourly_activity[hour] = count
-        
-        # New users by day (last 7 days)
-        new_users_weekly = {}
-        for days_back in range(7):
-            date = (today - timedelta(days=days_back)).date().isoformat()
-            count = connection.execute(
-                "SELECT COUNT(*) AS c FROM users WHERE DATE(join_date) = ?",
-                (date,)
-            ).fetchone()["c"]
-            new_users_weekly[date] = count
-        
-        # Top downloaders
+        # Daily activity for the last 30 days (single GROUP BY pass)
+        daily_counts = {
+            row["day"]: row["c"]
+            for row in connection.execute(
+                "SELECT DATE(last_active) AS day, COUNT(*) AS c FROM users "
+                "WHERE last_active >= ? GROUP BY day",
+                (day_strings[-1],),
+            )
+        }
+        daily_activity = {date: daily_counts.get(date, 0) for date in day_strings}
+
+        # Hourly activity for today (single GROUP BY pass)
+        hourly_counts = {
+            row["hour"]: row["c"]
+            for row in connection.execute(
+                "SELECT CAST(strftime('%H', last_active) AS INTEGER) AS hour, COUNT(*) AS c "
+                "FROM users WHERE last_active >= ? AND last_active < ? GROUP BY hour",
+                (today_str, tomorrow_str),
+            )
+        }
+        hourly_activity = {hour: hourly_counts.get(hour, 0) for hour in range(24)}
+
+        # New users by day, last 7 days (single GROUP BY pass)
+        weekly_counts = {
+            row["day"]: row["c"]
+            for row in connection.execute(
+                "SELECT DATE(join_date) AS day, COUNT(*) AS c FROM users "
+                "WHERE join_date >= ? GROUP BY day",
+                (day_strings[6],),
+            )
+        }
+        new_users_weekly = {date: weekly_counts.get(date, 0) for date in day_strings[:7]}
+
+        # Top downloaders: walk the partial descending index and stop after
+        # five rows instead of sorting every downloading user.
         top_downloaders = connection.execute(
             """
             SELECT username, first_name, downloads_count, user_id
-            FROM users 
-            WHERE downloads_count > 0 
-            ORDER BY downloads_count DESC 
+            FROM users INDEXED BY idx_users_downloads
+            WHERE downloads_count > 0
+            ORDER BY downloads_count DESC
             LIMIT 5
             """
         ).fetchall()
         
-        # Activity periods
-        periods = {
-            "today": 1, "yesterday": 2, "week": 7, 
-            "month": 30, "3months": 90
+        # Activity periods in a single conditional-aggregate scan
+        months3_threshold = (today - timedelta(days=89)).date().isoformat()
+        activity_row = connection.execute(
+            """
+            SELECT
+                SUM(CASE WHEN last_active >= ? THEN 1 ELSE 0 END) AS today,
+                SUM(CASE WHEN last_active >= ? AND last_active < ? THEN 1 ELSE 0 END) AS yesterday,
+                SUM(CASE WHEN last_active >= ? THEN 1 ELSE 0 END) AS week,
+                SUM(CASE WHEN last_active >= ? THEN 1 ELSE 0 END) AS month,
+                SUM(CASE WHEN last_active >= ? THEN 1 ELSE 0 END) AS months3
+            FROM users
+            """,
+            (
+                day_strings[0],
+                day_strings[2],
+                today_str,
+                day_strings[6],
+                day_strings[29],
+                months3_threshold,
+            ),
+        ).fetchone()
+        activity_stats = {
+            "today": activity_row["today"] or 0,
+            "yesterday": activity_row["yesterday"] or 0,
+            "week": activity_row["week"] or 0,
+            "month": activity_row["month"] or 0,
+            "3months": activity_row["months3"] or 0,
         }
-        activity_stats = {}
-        
-        for label, days in periods.items():
-            if label == "yesterday":
-                start_date = (today - timedelta(days=2)).date().isoformat()
-                end_date = (today - timedelta(days=1)).date().isoformat()
-                count = connection.execute(
-                    "SELECT COUNT(*) AS c FROM users WHERE DATE(last_active) BETWEEN ? AND ?",
-                    (start_date, end_date)
-                ).fetchone()["c"]
-            else:
-                threshold = (today - timedelta(days=days-1)).date().isoformat()
-                count = connection.execute(
-                    "SELECT COUNT(*) AS c FROM users WHERE DATE(last_active) >= ?",
-                    (threshold,)
-                ).fetchone()["c"]
-            activity_stats[label] = count
-        
+
         return {
             "total_users": total_users,
             "total_downloads": int(download_stats["total"]),
@@ -316,81 +515,214 @@ def get_detailed_statistics() -> Dict[str, Any]:
 # --------------------------- Admin management -------------------------- #
 
 
-def add_admin(user_id: int, username: Optional[str]) -> None:
+_admin_ids: Optional[frozenset[int]] = None
+_admin_ids_loaded_at = 0.0
+_admin_rows: Optional[List[Dict[str, Any]]] = None
+_admin_perm_cache: Dict[int, Dict[str, Any]] = {}
+
+# Mutations reload the set immediately; the TTL only catches edits made
+# to the database outside this process.
+_ADMIN_IDS_TTL = 15.0
+
+
+def _reload_admin_ids() -> None:
+    """Refresh the in-process admin id set from the admins table."""
+    global _admin_ids, _admin_ids_loaded_at, _admin_rows
     with get_connection() as connection:
-        connection.execute(
-            "INSERT OR IGNORE INTO admins (user_id, username) VALUES (?, ?)",
-            (user_id, username),
-        )
-        connection.commit()
+        cursor = connection.execute("SELECT user_id FROM admins")
+        cursor.row_factory = None
+        _admin_ids = frozenset(user_id for (user_id,) in cursor)
+    _admin_ids_loaded_at = time.monotonic()
+    _admin_rows = None
+    _admin_perm_cache.clear()
 
 
-def remove_admin(user_id: int) -> None:
+def add_admin(user_id: int, username: Optional[str]) -> None:
     with get_connection() as connection:
-        connection.execute("DELETE FROM admins WHERE user_id = ?", (user_id,))
-        connection.commit()
+        with connection:
+            connection.execute(
+                "INSERT OR IGNORE INTO admins (user_id, username) VALUES (?, ?)",
+                (user_id, username),
+            )
+    _reload_admin_ids()
 
 
-def get_admins() -> List[Dict[str, Any]]:
+def remove_admin(user_id: int) -> None:
     with get_connection() as connection:
-        cursor = connection.execute("SELECT user_id, username FROM admins ORDER BY user_id")
-        return [dict(row) for row in cursor.fetchall()]
+        with connection:
+            connection.execute("DELETE FROM admins WHERE user_id = ?", (user_id,))
+    _reload_admin_ids()
 
 
-def is_admin(user_id: int) -> bool:
+def get_admin(user_id: int) -> Optional[Dict[str, Any]]:
+    """Return one admin row without materializing the whole list."""
     with get_connection() as connection:
         cursor = connection.execute(
-            "SELECT 1 FROM admins WHERE user_id = ?",
+            "SELECT user_id, username FROM admins WHERE user_id = ?",
             (user_id,),
         )
-        return cursor.fetchone() is not None
+        row = cursor.fetchone()
+        return dict(row) if row is not None else None
+
+
+def get_admins() -> List[Dict[str, Any]]:
+    """Return admin rows from the in-process cache (reloaded on mutation)."""
+    global _admin_rows
+    if _admin_rows is None:
+        with get_connection() as connection:
+            cursor = connection.execute(
+                "SELECT user_id, username FROM admins ORDER BY user_id"
+            )
+            _admin_rows = [dict(row) for row in cursor.fetchall()]
+    return _admin_rows
+
+
+def is_admin(user_id: int) -> bool:
+    if _admin_ids is None or time.monotonic() - _admin_ids_loaded_at > _ADMIN_IDS_TTL:
+        _reload_admin_ids()
+    return user_id in _admin_ids
 
 
 # -------------------------- Channel management ------------------------ #
 
 
+# Required channels are read on every update but change only from the
+# admin panel; cache the list like _settings_cache, with a short TTL so
+# sibling workers sharing the database converge without a restart.
+_channels_cache: Optional[tuple[Dict[str, Any], ...]] = None
+_channels_cache_expires = 0.0
+_CHANNELS_CACHE_TTL = 15.0
+
+
+def invalidate_channels_cache() -> None:
+    """Drop the cached channel list (next read reloads from SQLite)."""
+    global _channels_cache
+    _channels_cache = None
+
+
 def add_channel(channel_id: str, title: str, link: str) -> None:
     with get_connection() as connection:
-        connection.execute(
-            "INSERT OR REPLACE INTO channels (channel_id, title, link) VALUES (?, ?, ?)",
-            (channel_id, title, link),
-        )
-        connection.commit()
+        with connection:
+            connection.execute(
+                "INSERT INTO channels (channel_id, title, link) VALUES (?, ?, ?) "
+                "ON CONFLICT(channel_id) DO UPDATE SET "
+                "title = excluded.title, link = excluded.link",
+                (channel_id, title, link),
+            )
+    invalidate_channels_cache()
 
 
 def remove_channel(channel_id: str) -> None:
     with get_connection() as connection:
-        connection.execute("DELETE FROM channels WHERE channel_id = ?", (channel_id,))
-        connection.commit()
+        with connection:
+            connection.execute("DELETE FROM channels WHERE channel_id = ?", (channel_id,))
+    invalidate_channels_cache()
+
+
+def _channel_row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+    # Normalize channel_id to str once here so callers can compare it
+    # against callback-data values without per-row casts.
+    channel = dict(row)
+    channel["channel_id"] = str(channel["channel_id"])
+    return channel
+
+
+def set_channel_member(channel_id: str, user_id: int, is_member: bool) -> None:
+    """Record one membership fact pushed by a chat_member update."""
+    set_channel_members([(channel_id, user_id, is_member)])
 
 
-def get_channels() -> List[Dict[str, Any]]:
+def set_channel_members(entries: Iterable[tuple[str, int, bool]]) -> None:
+    rows = [(str(channel_id), user_id, int(is_member)) for channel_id, user_id, is_member in entries]
+    if not rows:
+        return
+    with get_connection() as connection:
+        with connection:
+            connection.executemany(
+                "INSERT INTO channel_members (channel_id, user_id, is_member) VALUES (?, ?, ?) "
+                "ON CONFLICT(channel_id, user_id) DO UPDATE SET is_member = excluded.is_member",
+                rows,
+            )
+
+
+def get_channel_member_statuses(user_id: int, channel_ids: Iterable[str]) -> Dict[str, bool]:
+    """Return locally recorded membership per channel; absent keys mean unknown."""
+    ids = [str(channel_id) for channel_id in channel_ids]
+    if not ids:
+        return {}
+    placeholders = ",".join("?" * len(ids))
+    with get_connection() as connection:
+        cursor = connection.execute(
+            "SELECT channel_id, is_member FROM channel_members "
+            f"WHERE user_id = ? AND channel_id IN ({placeholders})",
+            (user_id, *ids),
+        )
+        return {row["channel_id"]: bool(row["is_member"]) for row in cursor.fetchall()}
+
+
+def get_channel(channel_id: str) -> Optional[Dict[str, Any]]:
+    """Fetch one channel by primary key (no full-table scan)."""
+    with get_connection() as connection:
+        row = connection.execute(
+            "SELECT channel_id, title, link FROM channels WHERE channel_id = ?",
+            (channel_id,),
+        ).fetchone()
+        return _channel_row_to_dict(row) if row is not None else None
+
+
+def get_channels() -> tuple[Dict[str, Any], ...]:
+    # Immutable tuple: har bir chaqiruvchi bitta kesh obyektini bo'lishadi,
+    # himoyaviy nusxa olishga hojat yo'q.
+    global _channels_cache, _channels_cache_expires
+    now = time.monotonic()
+    if _channels_cache is not None and now < _channels_cache_expires:
+        return _channels_cache
     with get_connection() as connection:
         cursor = connection.execute(
             "SELECT channel_id, title, link FROM channels ORDER BY title COLLATE NOCASE"
         )
-        return [dict(row) for row in cursor.fetchall()]
+        _channels_cache = tuple(_channel_row_to_dict(row) for row in cursor.fetchall())
+    _channels_cache_expires = now + _CHANNELS_CACHE_TTL
+    return _channels_cache
 
 
 # --------------------------- Settings helpers ------------------------- #
 
 
-def get_setting(key: str, default: Optional[str] = None) -> Optional[str]:
+_settings_cache: Optional[Dict[str, str]] = None
+
+
+def _load_settings_cache() -> Dict[str, str]:
+    """Load the whole (tiny) settings table into memory."""
+    global _settings_cache
     with get_connection() as connection:
-        cursor = connection.execute("SELECT value FROM settings WHERE key = ?", (key,))
-        row = cursor.fetchone()
-    if row is None:
-        return default
-    return row["value"]
+        cursor = connection.execute("SELECT key, value FROM settings")
+        cursor.row_factory = None
+        _settings_cache = dict(cursor)
+    return _settings_cache
+
+
+def get_setting(key: str, default: Optional[str] = None) -> Optional[str]:
+    cache = _settings_cache if _settings_cache is not None else _load_settings_cache()
+    return cache.get(key, default)
+
+
+def get_settings_many(keys: Iterable[str]) -> Dict[str, Optional[str]]:
+    """Fetch several settings in one cache lookup pass.
+
+    Callers needing a group of related keys (e.g. the share-button trio)
+    should use this instead of repeated ``get_setting`` calls.
+    """
+    cache = _settings_cache if _settings_cache is not None else _load_settings_cache()
+    return {key: cache.get(key) for key in keys}
 
 
 def set_setting(key: str, value: str) -> None:
     with get_connection() as connection:
-        connection.execute(
-            "INSERT INTO settings (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
-            (key, value),
-        )
-        connection.commit()
+        with connection:
+            connection.execute(_SQL_SET_SETTING, (key, value))
+    if _settings_cache is not None:
+        _settings_cache[key] = value
 
 
 # ----------------------------- Logging -------------------------------- #
@@ -398,11 +730,65 @@ def set_setting(key: str, value: str) -> None:
 
 def add_log(user_id: Optional[int], action: str) -> None:
     with get_connection() as connection:
-        connection.execute(
-            "INSERT INTO logs (user_id, action, created_at) VALUES (?, ?, ?)",
-            (user_id, action, _now_iso()),
-        )
-        connection.commit()
+        with connection:
+            connection.execute(_SQL_ADD_LOG, (user_id, action, _now_iso()))
+
+
+_log_queue: Optional["asyncio.Queue[tuple[Optional[int], str]]"] = None
+
+# Queued log writes are flushed either when this many rows pile up or
+# after the flush interval elapses, whichever comes first.
+_LOG_FLUSH_BATCH = 64
+_LOG_FLUSH_INTERVAL = 0.25
+
+
+def add_log_async(user_id: Optional[int], action: str) -> None:
+    """Queue a log row for the background worker (non-blocking).
+
+    Falls back to a synchronous insert when the worker is not running,
+    so call sites behave the same in scripts and tests.
+    """
+    if _log_queue is None:
+        add_log(user_id, action)
+        return
+    _log_queue.put_nowait((user_id, action))
+
+
+async def log_worker() -> None:
+    """Drain queued log rows and insert them in batches.
+
+    Started once from application startup; keeps the INSERT off the
+    Telegram reply path and amortizes the commit across a burst.
+    """
+    global _log_queue
+    _log_queue = asyncio.Queue()
+    try:
+        while True:
+            entries = [await _log_queue.get()]
+            try:
+                async with asyncio.timeout(_LOG_FLUSH_INTERVAL):
+                    while len(entries) < _LOG_FLUSH_BATCH:
+                        entries.append(await _log_queue.get())
+            except TimeoutError:
+                pass
+            add_logs_bulk(entries)
+    finally:
+        _log_queue = None
+
+
+def add_logs_bulk(entries: Iterable[tuple[Optional[int], str]]) -> None:
+    """Insert many log rows inside a single transaction (one fsync total)."""
+    now = _now_iso()
+    rows = [(user_id, action, now) for user_id, action in entries]
+    if not rows:
+        return
+    with get_connection() as connection:
+        with connection:
+            for start in range(0, len(rows), _BULK_CHUNK_SIZE):
+                connection.executemany(
+                    _SQL_ADD_LOG,
+                    rows[start:start + _BULK_CHUNK_SIZE],
+                )
 
 
 def get_recent_logs(limit: int = 20) -> List[Dict[str, Any]]:
@@ -418,7 +804,10 @@ def get_recent_logs(limit: int = 20) -> List[Dict[str, Any]]:
 
 
 def get_admin_permissions(user_id: int) -> Dict[str, bool]:
-    """Get all permissions for a specific admin."""
+    """Get all permissions for a specific admin (cached until updated)."""
+    cached = _admin_perm_cache.get(user_id)
+    if cached is not None:
+        return cached
     with get_connection() as connection:
         cursor = connection.execute(
             """SELECT can_manage_users, can_manage_channels, can_broadcast, 
@@ -428,7 +817,24 @@ def get_admin_permissions(user_id: int) -> Dict[str, bool]:
         row = cursor.fetchone()
         if row is None:
             return {}
-        return dict(row)
+        perms = dict(row)
+    _admin_perm_cache[user_id] = perms
+    return perms
+
+
+def get_admin_with_permissions(user_id: int) -> Optional[Dict[str, Any]]:
+    """Admin row together with its permission flags in one SELECT.
+
+    Permissions live as columns on the admins table, so no join is
+    needed — one row covers what get_admin + get_admin_permissions
+    would otherwise fetch in two queries.
+    """
+    with get_connection() as connection:
+        cursor = connection.execute(
+            "SELECT * FROM admins WHERE user_id = ?", (user_id,)
+        )
+        row = cursor.fetchone()
+        return dict(row) if row is not None else None
 
 
 def update_admin_permission(user_id: int, permission: str, value: bool) -> None:
@@ -441,14 +847,15 @@ def update_admin_permission(user_id: int, permission: str, value: bool) -> None:
         raise ValueError(f"Invalid permission: {permission}")
     
     with get_connection() as connection:
-        connection.execute(
-            f"UPDATE admins SET {permission} = ? WHERE user_id = ?",
-            (1 if value else 0, user_id)
-        )
-        connection.commit()
+        with connection:
+            connection.execute(
+                f"UPDATE admins SET {permission} = ? WHERE user_id = ?",
+                (1 if value else 0, user_id)
+            )
+    _admin_perm_cache.pop(user_id, None)
 
 
 def has_permission(user_id: int, permission: str) -> bool:
     """Check if an admin has a specific permission."""
     perms = get_admin_permissions(user_id)
-    return perms.get(permission, False) == 1
+    return perms.get(permission, 0) == 1
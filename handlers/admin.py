@@ -1,14 +1,24 @@
 from __future__ import annotations
 
 import asyncio
+import contextlib
 import html
+import inspect
 import logging
+import re
+import time
+import weakref
+from collections import deque
+from itertools import islice
+from functools import lru_cache, wraps
 from datetime import datetime, timezone
-from typing import Optional
+from types import MappingProxyType
+from typing import Awaitable, Callable, Optional
 
 from aiogram import Bot, F, Router
 from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
 from aiogram.filters import Command
+from aiogram.filters.callback_data import CallbackData
 from aiogram.fsm.context import FSMContext
 from aiogram.types import (
     CallbackQuery,
@@ -31,11 +41,33 @@ from utils.config import get_settings
 from states import AdminManageState, BroadcastState, ChannelManageState, SettingsState
 from utils.backup import create_database_backup
 from utils.stats import build_stats_overview
+from utils.subscription import publish_channels_invalidated
 from utils.system import format_uptime
 from utils.profile import update_bot_monthly_users_badge
 
 admin_router = Router()
 
+# Reply-keyboard labels dispatched through a single hash lookup instead of
+# one sequential F.text filter per handler. Populated at the bottom of the
+# module once every handler is defined; the filter below holds a live view
+# of the keys.
+TEXT_HANDLERS: dict[str, Callable[..., Awaitable[None]]] = {}
+_TEXT_HANDLER_EXTRAS: dict[str, frozenset[str]] = {}
+
+# Admin names, channel titles and settings values are mostly static, so
+# cache their escaped forms instead of re-running html.escape per render.
+_NEEDS_ESCAPE_RE = re.compile(r"[&<>\"']")
+
+
+@lru_cache(maxsize=1024)
+def _esc(value: str) -> str:
+    return html.escape(value) if _NEEDS_ESCAPE_RE.search(value) else value
+
+
+@lru_cache(maxsize=256)
+def _esc_attr(value: str) -> str:
+    return html.escape(value, quote=True) if _NEEDS_ESCAPE_RE.search(value) else value
+
 
 def _build_admins_list() -> str:
     """Format admins list for display."""
@@ -46,10 +78,10 @@ def _build_admins_list() -> str:
     header = "👥 <b>Adminlar ro'yxati:</b>\n\n"
     lines = []
     for index, admin in enumerate(admins, start=1):
-        user_id = html.escape(str(admin.get("user_id", "-")))
+        user_id = _esc(str(admin.get("user_id", "-")))
         username = admin.get("username")
         if username:
-            username_text = f"@{html.escape(username)}"
+            username_text = f"@{_esc(username)}"
         else:
             username_text = "@nomalum"
         lines.append(f"{index}. <b>{username_text}</b> — <code>{user_id}</code>")
@@ -57,28 +89,95 @@ def _build_admins_list() -> str:
     return header + "\n".join(lines)
 
 
-def _build_channel_management_view() -> tuple[str, InlineKeyboardMarkup]:
-    """Return formatted text and keyboard for channel management view."""
-    channels = db.get_channels()
+def _build_channel_management_view(
+    channels: Optional[list[dict]] = None,
+) -> tuple[str, InlineKeyboardMarkup]:
+    """Return formatted text and keyboard for channel management view.
+
+    Callers that already hold the channel list pass it in to avoid a
+    second fetch.
+    """
+    if channels is None:
+        channels = db.get_channels()
     subscription_enabled = _get_subscription_state()
 
-    text = "📺 *Kanal boshqaruvi*\n\n"
+    parts = ["📺 *Kanal boshqaruvi*\n\n"]
     if subscription_enabled:
-        text += "🔒 Majburiy obuna: Yoqilgan ✅\n\n"
+        parts.append("🔒 Majburiy obuna: Yoqilgan ✅\n\n")
     else:
-        text += "🔒 Majburiy obuna: O'chirilgan ❌\n\n"
+        parts.append("🔒 Majburiy obuna: O'chirilgan ❌\n\n")
 
     if channels:
-        text += "Majburiy obuna kanallari:\n"
+        parts.append("Majburiy obuna kanallari:\n")
         for index, channel in enumerate(channels, 1):
             title = channel.get("title") or "Noma'lum"
-            text += f"{index}. {title}\n"
+            parts.append(f"{index}. {title}\n")
     else:
-        text += "Hech qanday majburiy obuna kanali yo'q."
+        parts.append("Hech qanday majburiy obuna kanali yo'q.")
 
-    text += "\n\nAmalni tanlang:"
+    parts.append("\n\nAmalni tanlang:")
     keyboard = channels_management_kb(channels)
-    return text, keyboard
+    return "".join(parts), keyboard
+
+
+_TRUTHY: frozenset[str] = frozenset({"1", "true", "ha", "yes", "on", "enabled"})
+
+# Normalize t.me / tg:// channel references to @username in one pass.
+_TME_NORMALIZE = re.compile(r"^(?:https?://t\.me/|tg://resolve\?domain=|t\.me/)")
+
+# One-button prompt keyboards are immutable; build them once.
+def _single_button_kb(text: str, callback_data: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[[InlineKeyboardButton(text=text, callback_data=callback_data)]]
+    )
+
+
+_CANCEL_START_KB = _single_button_kb("❌ Bekor qilish", "admin_edit_start_cancel")
+_CANCEL_SUBSCRIPTION_KB = _single_button_kb("❌ Bekor qilish", "admin_edit_subscription_cancel")
+_CANCEL_SHARE_TEXT_KB = _single_button_kb("❌ Bekor qilish", "admin_share_text_cancel")
+_CANCEL_SHARE_URL_KB = _single_button_kb("❌ Bekor qilish", "admin_share_url_cancel")
+_BROADCAST_CANCEL_KB = _single_button_kb("❌ Bekor qilish", "admin_broadcast_cancel")
+_BACK_TO_CHANNELS_KB = _single_button_kb("🔙 Orqaga", "admin_channels_back")
+_BACK_TO_ADMIN_MENU_KB = _single_button_kb("🔙 Orqaga", "admin_back_to_admin_menu")
+
+_BROADCAST_CONFIRM_KB = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [InlineKeyboardButton(text="✅ Tasdiqlash", callback_data="admin_broadcast_confirm")],
+        [InlineKeyboardButton(text="♻️ Tugmalarni qayta kiritish", callback_data="admin_broadcast_retry")],
+        [InlineKeyboardButton(text="❌ Bekor qilish", callback_data="admin_broadcast_cancel")],
+    ]
+)
+
+_ADMIN_MENU_KB = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [
+            InlineKeyboardButton(text="📋 Adminlar ro'yxati", callback_data="admin_admins_list"),
+            InlineKeyboardButton(text="➕ Admin qo'shish", callback_data="admin_add"),
+        ],
+        [
+            InlineKeyboardButton(text="❌ Admin o'chirish", callback_data="admin_remove_select"),
+            InlineKeyboardButton(text="⚙️ Huquqlar", callback_data="admin_permissions_select"),
+        ],
+    ]
+)
+
+# /admin welcome message; only the name slot changes per render.
+_WELCOME_TEMPLATE = (
+    "👋 Assalomu alaykum, <b>{name}</b>!\n\n"
+    "🔧 <b>Admin panelga xush kelibsiz</b>\n"
+    "Quyidagi bo'limlardan birini tanlang:\n\n"
+    "📊 <i>Statistika</i> - Bot statistikalarini ko'rish\n"
+    " <i>Kanallar</i> - Majburiy obuna kanallarini boshqarish\n"
+    "👥 <i>Adminlar</i> - Admin huquqlarini boshqarish\n"
+    "📨 <i>Xabar yuborish</i> - Barcha foydalanuvchilarga xabar\n"
+    "📝 <i>Start matni</i> - Bot xush kelibsiz matnini o'zgartirish\n"
+    "🔗 <i>Ulashish tugmasi</i> - Yuklab olingan video tugmasini sozlash"
+)
+
+_ADMIN_MENU_TEXT = (
+    "👑 <b>Admin boshqaruvi</b>\n\n"
+    "Quyidagi amallardan birini tanlang:"
+)
 
 
 def _get_subscription_state() -> bool:
@@ -88,7 +187,7 @@ def _get_subscription_state() -> bool:
         return True
     if isinstance(raw, bool):
         return raw
-    return str(raw).strip().lower() in {"1", "true", "ha", "enabled", "on", "yes"}
+    return str(raw).strip().lower() in _TRUTHY
 
 
 def _set_subscription_state(value: bool) -> None:
@@ -99,26 +198,66 @@ def _set_subscription_state(value: bool) -> None:
 def _truthy(value: Optional[str], *, default: bool = False) -> bool:
     if value is None:
         return default
-    return str(value).strip().lower() in {"1", "true", "ha", "yes", "on", "enabled"}
+    return str(value).strip().lower() in _TRUTHY
+
+
+# Per-user locks so duplicate presses from one user serialize instead
+# of racing; weak values let idle entries be collected.
+_user_locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def _lock_for(user_id: int) -> asyncio.Lock:
+    lock = _user_locks.get(user_id)
+    if lock is None:
+        lock = _user_locks[user_id] = asyncio.Lock()
+    return lock
+
+
+def _serialized_per_user(handler):
+    """Run the handler under the sender's lock; other users unaffected."""
+
+    @wraps(handler)
+    async def wrapper(event, *args, **kwargs):
+        async with _lock_for(_uid(event)):
+            return await handler(event, *args, **kwargs)
+
+    return wrapper
+
+
+_SHARE_BUTTON_KEYS = ("share_button_enabled", "share_button_text", "share_button_url")
 
 
 def _get_share_button_state() -> tuple[bool, str, str]:
+    values = db.get_settings_many(_SHARE_BUTTON_KEYS)
     enabled = _truthy(
-        db.get_setting("share_button_enabled", db.DEFAULT_SETTINGS.get("share_button_enabled", "1")),
+        values["share_button_enabled"] or db.DEFAULT_SETTINGS.get("share_button_enabled", "1"),
         default=True,
     )
-    text_value = db.get_setting("share_button_text", db.DEFAULT_SETTINGS.get("share_button_text", "")) or ""
-    url_value = db.get_setting("share_button_url", db.DEFAULT_SETTINGS.get("share_button_url", "")) or ""
+    text_value = values["share_button_text"] or db.DEFAULT_SETTINGS.get("share_button_text", "") or ""
+    url_value = values["share_button_url"] or db.DEFAULT_SETTINGS.get("share_button_url", "") or ""
     return enabled, text_value, url_value
 
 
+# Rendered share-button overview; flushed whenever a share setting is
+# written so the next render reflects the new values.
+_share_overview_cache: Optional[tuple[str, InlineKeyboardMarkup]] = None
+
+
+def _invalidate_share_overview() -> None:
+    global _share_overview_cache
+    _share_overview_cache = None
+
+
 def _build_share_button_overview() -> tuple[str, InlineKeyboardMarkup]:
+    global _share_overview_cache
+    if _share_overview_cache is not None:
+        return _share_overview_cache
     enabled, text_value, url_value = _get_share_button_state()
     status = "✅ Yoqilgan" if enabled else "❌ O'chirilgan"
-    text_display = html.escape(text_value) if text_value else "<i>Matn kiritilmagan</i>"
+    text_display = _esc(text_value) if text_value else "<i>Matn kiritilmagan</i>"
     if url_value:
         url_display = (
-            f"<a href=\"{html.escape(url_value, quote=True)}\">{html.escape(url_value)}</a>"
+            f"<a href=\"{_esc_attr(url_value)}\">{_esc(url_value)}</a>"
         )
     else:
         url_display = "<i>Havola kiritilmagan</i>"
@@ -132,14 +271,18 @@ def _build_share_button_overview() -> tuple[str, InlineKeyboardMarkup]:
     )
 
     keyboard = share_button_settings_kb(enabled)
-    return overview, keyboard
+    _share_overview_cache = (overview, keyboard)
+    return _share_overview_cache
+
+
+_SCHEME_RE = re.compile(r"^(?:https?|tg)://")
 
 
 def _normalize_button_url(raw: str) -> Optional[str]:
     value = raw.strip()
     if not value:
         return None
-    if value.startswith(("http://", "https://", "tg://")):
+    if _SCHEME_RE.match(value):
         return value
     if value.startswith("t.me/"):
         return f"https://{value}"
@@ -148,44 +291,69 @@ def _normalize_button_url(raw: str) -> Optional[str]:
 
 @admin_router.message(Command("admin"))
 async def admin_panel_entry(message: Message) -> None:
-    if not await _ensure_admin(message):
+    if not await _ensure_admin_msg(message):
         return
     user_name = message.from_user.first_name if message.from_user else "Admin"
-    welcome_text = (
-        f"👋 Assalomu alaykum, <b>{html.escape(user_name)}</b>!\n\n"
-        "🔧 <b>Admin panelga xush kelibsiz</b>\n"
-        "Quyidagi bo'limlardan birini tanlang:\n\n"
-        "📊 <i>Statistika</i> - Bot statistikalarini ko'rish\n"
-        " <i>Kanallar</i> - Majburiy obuna kanallarini boshqarish\n"
-        "👥 <i>Adminlar</i> - Admin huquqlarini boshqarish\n"
-    "📨 <i>Xabar yuborish</i> - Barcha foydalanuvchilarga xabar\n"
-    "📝 <i>Start matni</i> - Bot xush kelibsiz matnini o'zgartirish\n"
-    "🔗 <i>Ulashish tugmasi</i> - Yuklab olingan video tugmasini sozlash"
-    )
+    welcome_text = _WELCOME_TEMPLATE.format_map({"name": _esc(user_name)})
     await message.answer(welcome_text, reply_markup=admin_main_reply_kb(), parse_mode="HTML")
 
 
+def _stats_bundle():
+    """Build the stats overview at most once per 5-second bucket.
+
+    Two admins pressing the stats button back-to-back share one
+    aggregate scan instead of re-running it.
+    """
+    return _stats_bundle_at(int(time.monotonic() // 5))
+
+
+@lru_cache(maxsize=1)
+def _stats_bundle_at(bucket: int):
+    return build_stats_overview(), db.get_user_counts()
+
+
+def _fmt_stats_md(overview, counts) -> str:
+    return (
+        f"📊 *Bot statistikalari*\n\n"
+        f"👥 Jami foydalanuvchilar: {counts.get('total_users', 0):,}\n"
+        f"📈 Bugun faol: {counts.get('active_today', 0):,}\n"
+        f"🗓 Oylik faol: {counts.get('active_month', 0):,}\n"
+        f"📥 Yuklab olishlar: {counts.get('total_downloads', 0):,}\n\n"
+        f"📈 O'sish:\n{overview.growth_chart[:200]}"
+    )
+
+
+def _fmt_stats_html(overview, counts) -> str:
+    return (
+        f"📊 <b>BOT STATISTIKASI</b>\n"
+        f"{'='*30}\n\n"
+
+        f"👥 <b>Foydalanuvchilar:</b>\n"
+        f"   • Jami: <code>{overview.total_users:,}</code>\n"
+        f"   • Bugun faol: <code>{overview.active_today:,}</code>\n"
+        f"   • Haftalik faol: <code>{overview.active_week:,}</code>\n"
+        f"   • Oylik faol: <code>{overview.active_month:,}</code>\n\n"
+
+        f"📥 <b>Yuklab olishlar:</b>\n"
+        f"   • Jami: <code>{overview.total_downloads:,}</code>\n\n"
+
+        f"📈 <b>O'sish (so'nggi kunlar):</b>\n"
+        f"<pre>{overview.growth_chart[:200]}...</pre>\n\n"
+
+        f"⏰ <b>Yangilangan:</b> {_now_stamp()}"
+    )
+
+
 @admin_router.callback_query(F.data == "admin_stats")
 async def admin_stats_callback(callback: CallbackQuery) -> None:
     """Handle statistics button callback."""
-    if not await _ensure_admin(callback):
+    if not await _ensure_admin_cb(callback):
         return
     await callback.answer()
     
     try:
-        # Get basic statistics only to avoid length issues
-        overview = build_stats_overview()
-        counts = db.get_user_counts()
-        
-        # Simple, consistent statistics format
-        stats_text = (
-            f"📊 *Bot statistikalari*\n\n"
-            f"👥 Jami foydalanuvchilar: {counts.get('total', 0):,}\n"
-            f"📈 Faol foydalanuvchilar: {counts.get('active', 0):,}\n"
-            f"🆕 Yangi foydalanuvchilar: {counts.get('new', 0):,}\n"
-            f"🚫 Bloklangan: {counts.get('blocked', 0):,}\n\n"
-            f"{overview}"
-        )
+        overview, counts = await _db(_stats_bundle)
+        stats_text = _fmt_stats_md(overview, counts)
         
         if callback.message:
             await callback.message.edit_text(stats_text, parse_mode="Markdown")
@@ -201,37 +369,26 @@ async def admin_channels_callback(callback: CallbackQuery) -> None:
     await admin_manage_channels(callback)
 
 
-@admin_router.message(F.text == "📊 Statistika")
+@admin_router.message(F.text.in_(TEXT_HANDLERS.keys()))
+async def admin_text_menu(message: Message, bot: Bot, state: FSMContext) -> None:
+    """Dispatch admin reply-keyboard presses via a table lookup."""
+    handler = TEXT_HANDLERS[message.text]
+    extras = _TEXT_HANDLER_EXTRAS[message.text]
+    kwargs = {
+        name: value
+        for name, value in (("bot", bot), ("state", state))
+        if name in extras
+    }
+    await handler(message, **kwargs)
+
+
 async def admin_show_stats(message: Message) -> None:
-    if not await _ensure_admin(message):
+    if not await _ensure_admin_msg(message):
         return
     
     try:
-        # Get basic statistics only to avoid length issues
-        overview = build_stats_overview()
-        counts = db.get_user_counts()
-        
-        # Simple, consistent statistics format
-        stats_text = (
-            f"📊 <b>BOT STATISTIKASI</b>\n"
-            f"{'='*30}\n\n"
-            
-            f"👥 <b>Foydalanuvchilar:</b>\n"
-            f"   • Jami: <code>{overview.total_users:,}</code>\n"
-            f"   • Bugun faol: <code>{overview.active_today:,}</code>\n"
-            f"   • Haftalik faol: <code>{overview.active_week:,}</code>\n"
-            f"   • Oylik faol: <code>{overview.active_month:,}</code>\n\n"
-            
-            f"📥 <b>Yuklab olishlar:</b>\n"
-            f"   • Jami: <code>{overview.total_downloads:,}</code>\n\n"
-            
-            f"📈 <b>O'sish (so'nggi kunlar):</b>\n"
-            f"<pre>{overview.growth_chart[:200]}...</pre>\n\n"
-            
-            f"⏰ <b>Yangilangan:</b> {datetime.now().strftime('%d.%m.%Y %H:%M')}"
-        )
-        
-        await message.answer(stats_text)
+        overview, counts = await _db(_stats_bundle)
+        await message.answer(_fmt_stats_html(overview, counts))
         
     except Exception as error:
         logging.exception("Statistika olishda xato")
@@ -239,9 +396,8 @@ async def admin_show_stats(message: Message) -> None:
         
 
 
-@admin_router.message(F.text == "🔗 Ulashish tugmasi")
 async def admin_share_button_menu(message: Message) -> None:
-    if not await _ensure_admin(message):
+    if not await _ensure_admin_msg(message):
         return
 
     overview, keyboard = _build_share_button_overview()
@@ -253,18 +409,20 @@ async def admin_share_button_menu(message: Message) -> None:
     )
 
 
-@admin_router.message(F.text == "🗓 Oylik foydalanuvchilar")
 async def admin_monthly_users(message: Message, bot: Bot) -> None:
-    if not await _ensure_admin(message):
+    if not await _ensure_admin_msg(message):
         return
 
     try:
-        users = db.get_monthly_active_users(limit=25)
+        users = await _db(db.get_monthly_active_users, limit=25)
         if not users:
             await message.answer("❌ So'nggi 30 kun ichida faol foydalanuvchilar topilmadi.")
             return
 
         lines: list[str] = []
+        # Stay under Telegram's 4096-char limit in a single pass by
+        # tracking the running length instead of re-joining on overflow.
+        total = 0
         for index, user in enumerate(users, start=1):
             name = user.get("first_name") or "❓ Noma'lum"
             username = user.get("username")
@@ -272,29 +430,29 @@ async def admin_monthly_users(message: Message, bot: Bot) -> None:
                 name = f"<a href='tg://user?id={user.get('user_id')}'>{name}</a> (@{username})"
             else:
                 name = f"<a href='tg://user?id={user.get('user_id')}'>{name}</a>"
-            
+
             last_active = _format_last_active(user.get("last_active"))
             downloads = user.get("downloads_count") or 0
-            
-            lines.append(
+
+            line = (
                 f"{index}. {name}\n"
                 f"   📅 <i>{last_active}</i> • 📥 <i>{downloads} yuklab olish</i>"
             )
+            total += len(line) + 1
+            if total > 3800:
+                lines.append("\n<i>... va boshqalar</i>")
+                break
+            lines.append(line)
 
         # Update bot profile with current monthly count
         await update_bot_monthly_users_badge(bot)
-        
+
         header = (
             f"🗓 <b>So'nggi 30 kun ichida faol foydalanuvchilar</b>\n"
             f"📊 Jami: {len(users)} ta (eng faollari)\n\n"
         )
-        
-        # Split into chunks if too long
-        text = header + "\n".join(lines)
-        if len(text) > 4000:
-            text = header + "\n".join(lines[:15]) + "\n\n<i>... va boshqalar</i>"
-            
-        await message.answer(text)
+
+        await message.answer(header + "\n".join(lines))
         
     except Exception as error:
         logging.exception("Oylik foydalanuvchilarni olishda xato")
@@ -304,10 +462,10 @@ async def admin_monthly_users(message: Message, bot: Bot) -> None:
 @admin_router.callback_query(F.data == "admin_manage_channels")
 async def admin_manage_channels(callback: CallbackQuery) -> None:
     """Handle channels management."""
-    if not await _ensure_admin(callback):
+    if not await _ensure_admin_cb(callback):
         return
     await callback.answer()
-    text, keyboard = _build_channel_management_view()
+    text, keyboard = await _db(_build_channel_management_view)
 
     if callback.message:
         try:
@@ -319,20 +477,20 @@ async def admin_manage_channels(callback: CallbackQuery) -> None:
 @admin_router.message(F.text.func(lambda text: text and "Kanal boshqaruvi" in text))
 async def admin_manage_channels_text(message: Message) -> None:
     """Show channel management via plain text command."""
-    if not await _ensure_admin(message):
+    if not await _ensure_admin_msg(message):
         return
-    text, keyboard = _build_channel_management_view()
+    text, keyboard = await _db(_build_channel_management_view)
     await message.answer(text, reply_markup=keyboard, parse_mode="Markdown")
 
 
 @admin_router.callback_query(F.data == "admin_disable_subscription")
 async def admin_disable_subscription(callback: CallbackQuery) -> None:
     """Toggle subscription requirement."""
-    if not await _ensure_admin(callback):
+    if not await _ensure_admin_cb(callback):
         return
     current_state = _get_subscription_state()
     new_state = not current_state
-    _set_subscription_state(new_state)
+    await _db(_set_subscription_state, new_state)
     
     if new_state:
         status_text = "yoqildi ✅"
@@ -340,7 +498,7 @@ async def admin_disable_subscription(callback: CallbackQuery) -> None:
         status_text = "o'chirildi ❌"
     text = f"🔒 Majburiy obuna {status_text}"
 
-    text_view, keyboard = _build_channel_management_view()
+    text_view, keyboard = await _db(_build_channel_management_view)
 
     if callback.message:
         try:
@@ -354,13 +512,13 @@ async def admin_disable_subscription(callback: CallbackQuery) -> None:
 @admin_router.callback_query(F.data == "admin_channels_list")
 async def admin_channels_list(callback: CallbackQuery) -> None:
     """Show detailed channels list."""
-    if not await _ensure_admin(callback):
+    if not await _ensure_admin_cb(callback):
         return
     await callback.answer()
     
-    channels = db.get_channels()
+    channels = await _db(db.get_channels)
 
-    text = "📋 <b>Kanallar ro'yxati</b>\n\n"
+    parts = ["📋 <b>Kanallar ro'yxati</b>\n\n"]
 
     if channels:
         for index, channel in enumerate(channels, 1):
@@ -368,18 +526,20 @@ async def admin_channels_list(callback: CallbackQuery) -> None:
             link_raw = channel.get("link") or "Havola yo'q"
             channel_id = channel.get("channel_id", "")
 
-            title = html.escape(title_raw)
-            link_display = html.escape(link_raw)
-            link_href = html.escape(link_raw, quote=True)
-            channel_id_display = html.escape(str(channel_id))
+            title = _esc(title_raw)
+            link_display = _esc(link_raw)
+            link_href = _esc_attr(link_raw)
+            channel_id_display = _esc(str(channel_id))
 
-            text += (
+            parts.append(
                 f"{index}. <b>{title}</b>\n"
                 f"&ensp;🆔 ID: <code>{channel_id_display}</code>\n"
                 f"&ensp;🔗 Havola: <a href=\"{link_href}\">{link_display}</a>\n\n"
             )
     else:
-        text += "Hech qanday kanal qo'shilmagan."
+        parts.append("Hech qanday kanal qo'shilmagan.")
+
+    text = "".join(parts)
 
     keyboard = channels_list_kb(channels)
 
@@ -403,11 +563,11 @@ async def admin_channels_back(callback: CallbackQuery) -> None:
 @admin_router.callback_query(F.data == "admin_channel_delete")
 async def admin_channel_delete(callback: CallbackQuery) -> None:
     """Show channels for deletion."""
-    if not await _ensure_admin(callback):
+    if not await _ensure_admin_cb(callback):
         return
     await callback.answer()
     
-    channels = db.get_channels()
+    channels = await _db(db.get_channels)
     
     text = "🗑 *Kanal o'chirish*\n\n"
     
@@ -416,10 +576,7 @@ async def admin_channel_delete(callback: CallbackQuery) -> None:
         keyboard = channels_list_kb(channels)
     else:
         text += "O'chirish uchun kanallar yo'q."
-        from aiogram.utils.keyboard import InlineKeyboardBuilder
-        builder = InlineKeyboardBuilder()
-        builder.button(text="🔙 Orqaga", callback_data="admin_channels_back")
-        keyboard = builder.as_markup()
+        keyboard = _BACK_TO_CHANNELS_KB
     
     if callback.message:
         try:
@@ -431,22 +588,22 @@ async def admin_channel_delete(callback: CallbackQuery) -> None:
 @admin_router.callback_query(F.data.startswith("admin_channel_remove:"))
 async def admin_channel_remove_confirm(callback: CallbackQuery) -> None:
     """Handle channel removal."""
-    if not await _ensure_admin(callback):
+    if not await _ensure_admin_cb(callback):
         return
     
     channel_id = callback.data.split(":", 1)[1]
-    
+
     # Get channel info before deletion
-    channels = db.get_channels()
-    channel_to_remove = None
-    for channel in channels:
-        if str(channel.get('channel_id', '')) == channel_id:
-            channel_to_remove = channel
-            break
-    
+    channel_to_remove = await _db(db.get_channel, channel_id)
+
     if channel_to_remove:
         try:
-            db.remove_channel(channel_id)
+            await _db(db.remove_channel, channel_id)
+            await publish_channels_invalidated()
+            db.add_log_async(
+                callback.from_user.id if callback.from_user else None,
+                f"channel_remove:{channel_id}",
+            )
             title = channel_to_remove.get('title') or 'Noma\'lum kanal'
             await callback.answer(f"✅ {title} kanali o'chirildi", show_alert=True)
         except Exception as e:
@@ -460,7 +617,7 @@ async def admin_channel_remove_confirm(callback: CallbackQuery) -> None:
 
 @admin_router.callback_query(F.data == "admin_channel_add")
 async def admin_channel_add(callback: CallbackQuery, state: FSMContext) -> None:
-    if not await _ensure_admin(callback):
+    if not await _ensure_admin_cb(callback):
         return
     await state.set_state(ChannelManageState.waiting_for_link)
     await callback.answer()
@@ -472,7 +629,7 @@ async def admin_channel_add(callback: CallbackQuery, state: FSMContext) -> None:
 
 @admin_router.message(ChannelManageState.waiting_for_link)
 async def process_channel_link(message: Message, state: FSMContext, bot: Bot) -> None:
-    if not await _ensure_admin(message):
+    if not await _ensure_admin_msg(message):
         return
     chat = message.forward_from_chat
     identifier: Optional[str] = None
@@ -491,11 +648,8 @@ async def process_channel_link(message: Message, state: FSMContext, bot: Bot) ->
         if not raw:
             await message.answer("Havola topilmadi, qayta yuboring.")
             return
-        cleaned = raw.split("?", 1)[0].strip()
-        cleaned = cleaned.replace("https://t.me/", "@").replace("http://t.me/", "@")
-        cleaned = cleaned.replace("tg://resolve?domain=", "@")
-        cleaned = cleaned.replace("t.me/", "@")
-        cleaned = cleaned.strip()
+        cleaned = _TME_NORMALIZE.sub("@", raw)
+        cleaned = cleaned.split("?", 1)[0].strip()
 
         lookup = cleaned
         if cleaned.startswith("-100"):
@@ -521,10 +675,11 @@ async def process_channel_link(message: Message, state: FSMContext, bot: Bot) ->
         await message.answer("Kanal ma'lumotlari aniqlanmadi.")
         return
 
-    db.add_channel(identifier, title, link)
-    db.add_log(message.from_user.id if message.from_user else None, f"channel_add:{identifier}")
+    await _db(db.add_channel, identifier, title, link)
+    await publish_channels_invalidated()
+    db.add_log_async(message.from_user.id if message.from_user else None, f"channel_add:{identifier}")
     await state.clear()
-    channels = db.get_channels()
+    channels = await _db(db.get_channels)
     await message.answer(
         "✅ Kanal muvaffaqiyatli qo'shildi.",
         reply_markup=channels_management_kb(channels),
@@ -535,9 +690,6 @@ async def _prompt_subscription_text_edit(message: Message, state: FSMContext) ->
     """Send current subscription text and ask for replacement."""
     current = db.get_setting("subscribe_text", db.DEFAULT_SETTINGS["subscribe_text"])
     await state.set_state(SettingsState.waiting_for_subscription_text)
-    builder = InlineKeyboardBuilder()
-    builder.button(text="❌ Bekor qilish", callback_data="admin_edit_subscription_cancel")
-    builder.adjust(1)
 
     escaped_current = html.escape(current)
     logging.debug("Prompting subscription text edit; length=%d", len(current))
@@ -549,7 +701,7 @@ async def _prompt_subscription_text_edit(message: Message, state: FSMContext) ->
             f"<pre>{escaped_current}</pre>\n\n"
             "✏️ Yangi matnni yuboring.\n"
             "ℹ️ HTML teglari (&lt;b&gt;, &lt;i&gt;, &lt;code&gt; va boshqalar) ishlatishingiz mumkin.",
-            reply_markup=builder.as_markup(),
+            reply_markup=_CANCEL_SUBSCRIPTION_KB,
             parse_mode="HTML",
         )
     except TelegramBadRequest as error:
@@ -559,59 +711,22 @@ async def _prompt_subscription_text_edit(message: Message, state: FSMContext) ->
             "Amaldagi matn:\n"
             f"{current}\n\n"
             "Yangi matnni yuboring. HTML teglari ishlatishingiz mumkin.",
-            reply_markup=builder.as_markup(),
+            reply_markup=_CANCEL_SUBSCRIPTION_KB,
         )
 
 
-@admin_router.callback_query(F.data.startswith("admin_channel_remove"))
-async def admin_channel_remove(callback: CallbackQuery) -> None:
-    if not await _ensure_admin(callback):
-        return
-    parts = callback.data.split(":", maxsplit=1)
-    if len(parts) != 2:
-        await callback.answer("Noto'g'ri ma'lumot.", show_alert=True)
-        return
-    channel_id = parts[1]
-    db.remove_channel(channel_id)
-    db.add_log(callback.from_user.id if callback.from_user else None, f"channel_remove:{channel_id}")
-    await callback.answer("Kanal o'chirildi.")
-    channels = db.get_channels()
-    if callback.message:
-        text = "Majburiy obuna kanallari ro'yxati:" if channels else "Royxat bo'sh."
-        try:
-            await callback.message.edit_text(text, reply_markup=channels_management_kb(channels))
-        except TelegramBadRequest:
-            pass
 
-
-@admin_router.message(F.text.in_({"👥 Adminlar", "👑 Admin boshqaruvi"}))
 async def admin_manage_admins(message: Message) -> None:
-    if not await _ensure_admin(message):
+    if not await _ensure_admin_msg(message):
         return
     
-    # Build inline keyboard with 4 buttons
-    builder = InlineKeyboardBuilder()
-    builder.button(text="📋 Adminlar ro'yxati", callback_data="admin_admins_list")
-    builder.button(text="➕ Admin qo'shish", callback_data="admin_add")
-    builder.button(text="❌ Admin o'chirish", callback_data="admin_remove_select")
-    builder.button(text="⚙️ Huquqlar", callback_data="admin_permissions_select")
-    builder.adjust(2, 2)
-    
-    text = (
-        "👑 <b>Admin boshqaruvi</b>\n\n"
-        "Quyidagi amallardan birini tanlang:"
-    )
-    
-    await message.answer(text, reply_markup=builder.as_markup(), parse_mode="HTML")
+    await message.answer(_ADMIN_MENU_TEXT, reply_markup=_ADMIN_MENU_KB, parse_mode="HTML")
 
 
 async def _prompt_start_text_edit(message: Message, state: FSMContext) -> None:
     """Send current start text and ask for replacement."""
     current = db.get_setting("start_text", db.DEFAULT_SETTINGS["start_text"])
     await state.set_state(SettingsState.waiting_for_start_text)
-    builder = InlineKeyboardBuilder()
-    builder.button(text="❌ Bekor qilish", callback_data="admin_edit_start_cancel")
-    builder.adjust(1)
 
     # Escape HTML entities to display correctly
     escaped_current = html.escape(current)
@@ -625,7 +740,7 @@ async def _prompt_start_text_edit(message: Message, state: FSMContext) -> None:
             "✏️ Yangi matnni shu yerga yuboring.\n"
             "ℹ️ HTML teglari (&lt;b&gt;, &lt;i&gt;, &lt;code&gt; va boshqalar) ishlatishingiz mumkin.\n"
             "❗ Bekor qilish uchun pastdagi tugmani bosing yoki 'Bekor' deb yozing.",
-            reply_markup=builder.as_markup(),
+            reply_markup=_CANCEL_START_KB,
             parse_mode="HTML",
         )
     except TelegramBadRequest as e:
@@ -637,13 +752,13 @@ async def _prompt_start_text_edit(message: Message, state: FSMContext) -> None:
             f"{current}\n\n"
             "Yangi matnni shu yerga yuboring.\n"
             "HTML teglari (<b>, <i>, <code> ...) ishlatishingiz mumkin.",
-            reply_markup=builder.as_markup(),
+            reply_markup=_CANCEL_START_KB,
         )
 
 
 @admin_router.callback_query(F.data == "admin_edit_subscription_text")
 async def admin_edit_subscription_callback(callback: CallbackQuery, state: FSMContext) -> None:
-    if not await _ensure_admin(callback):
+    if not await _ensure_admin_cb(callback):
         return
     await callback.answer()
     if callback.message:
@@ -656,7 +771,7 @@ async def admin_edit_subscription_callback(callback: CallbackQuery, state: FSMCo
 
 @admin_router.callback_query(F.data == "admin_edit_subscription_cancel")
 async def admin_edit_subscription_cancel(callback: CallbackQuery, state: FSMContext) -> None:
-    if not await _ensure_admin(callback):
+    if not await _ensure_admin_cb(callback):
         return
     await state.clear()
     await callback.answer("Bekor qilindi", show_alert=False)
@@ -667,16 +782,15 @@ async def admin_edit_subscription_cancel(callback: CallbackQuery, state: FSMCont
             await callback.message.answer("🔔 Obuna xabari tahrirlash bekor qilindi.")
 
 
-@admin_router.message(F.text == "📝 Start xabarini tahrirlash")
 async def admin_edit_start_text(message: Message, state: FSMContext) -> None:
-    if not await _ensure_admin(message):
+    if not await _ensure_admin_msg(message):
         return
     await _prompt_start_text_edit(message, state)
 
 
 @admin_router.callback_query(F.data == "admin_edit_start")
 async def admin_edit_start_callback(callback: CallbackQuery, state: FSMContext) -> None:
-    if not await _ensure_admin(callback):
+    if not await _ensure_admin_cb(callback):
         return
     await callback.answer()
     if callback.message:
@@ -685,7 +799,7 @@ async def admin_edit_start_callback(callback: CallbackQuery, state: FSMContext)
 
 @admin_router.callback_query(F.data == "admin_edit_start_cancel")
 async def admin_edit_start_cancel(callback: CallbackQuery, state: FSMContext) -> None:
-    if not await _ensure_admin(callback):
+    if not await _ensure_admin_cb(callback):
         return
     await state.clear()
     await callback.answer("Bekor qilindi", show_alert=False)
@@ -698,13 +812,14 @@ async def admin_edit_start_cancel(callback: CallbackQuery, state: FSMContext) ->
 
 @admin_router.callback_query(F.data == "admin_share_toggle")
 async def admin_share_toggle(callback: CallbackQuery) -> None:
-    if not await _ensure_admin(callback):
+    if not await _ensure_admin_cb(callback):
         return
 
     enabled, _, _ = _get_share_button_state()
     new_state = not enabled
-    db.set_setting("share_button_enabled", "1" if new_state else "0")
-    db.add_log(callback.from_user.id if callback.from_user else None, f"share_button_toggle:{int(new_state)}")
+    await _db(db.set_setting, "share_button_enabled", "1" if new_state else "0")
+    _invalidate_share_overview()
+    db.add_log_async(callback.from_user.id if callback.from_user else None, f"share_button_toggle:{int(new_state)}")
 
     status_text = "yoqildi ✅" if new_state else "o'chirildi ❌"
     await callback.answer(f"Tugma {status_text}.", show_alert=True)
@@ -729,7 +844,7 @@ async def admin_share_toggle(callback: CallbackQuery) -> None:
 
 @admin_router.callback_query(F.data == "admin_share_text")
 async def admin_share_text(callback: CallbackQuery, state: FSMContext) -> None:
-    if not await _ensure_admin(callback):
+    if not await _ensure_admin_cb(callback):
         return
 
     await state.set_state(SettingsState.waiting_for_share_button_text)
@@ -740,11 +855,7 @@ async def admin_share_text(callback: CallbackQuery, state: FSMContext) -> None:
         db.DEFAULT_SETTINGS.get("share_button_text", "♻️ Do'stlarga ulashish"),
     ) or ""
 
-    builder = InlineKeyboardBuilder()
-    builder.button(text="❌ Bekor qilish", callback_data="admin_share_text_cancel")
-    builder.adjust(1)
-
-    escaped = html.escape(current_text) if current_text else ""
+    escaped = _esc(current_text) if current_text else ""
 
     if callback.message:
         try:
@@ -754,7 +865,7 @@ async def admin_share_text(callback: CallbackQuery, state: FSMContext) -> None:
                 f"<pre>{escaped or '---'}</pre>\n\n"
                 "Yangi matnni yuboring (64 ta belgigacha).\n"
                 "➡️ Standart matnga qaytish uchun <code>default</code> deb yozing.",
-                reply_markup=builder.as_markup(),
+                reply_markup=_CANCEL_SHARE_TEXT_KB,
                 parse_mode="HTML",
             )
         except TelegramBadRequest:
@@ -762,13 +873,13 @@ async def admin_share_text(callback: CallbackQuery, state: FSMContext) -> None:
                 "✏️ Tugma matnini tahrirlash\n\n"
                 f"Amaldagi matn:\n{current_text or '-'}\n\n"
                 "Yangi matnni yuboring (64 belgi).",
-                reply_markup=builder.as_markup(),
+                reply_markup=_CANCEL_SHARE_TEXT_KB,
             )
 
 
 @admin_router.callback_query(F.data == "admin_share_text_cancel")
 async def admin_share_text_cancel(callback: CallbackQuery, state: FSMContext) -> None:
-    if not await _ensure_admin(callback):
+    if not await _ensure_admin_cb(callback):
         return
     await state.clear()
     await callback.answer("Bekor qilindi.", show_alert=False)
@@ -789,7 +900,7 @@ async def admin_share_text_cancel(callback: CallbackQuery, state: FSMContext) ->
 
 @admin_router.callback_query(F.data == "admin_share_url")
 async def admin_share_url(callback: CallbackQuery, state: FSMContext) -> None:
-    if not await _ensure_admin(callback):
+    if not await _ensure_admin_cb(callback):
         return
 
     await state.set_state(SettingsState.waiting_for_share_button_url)
@@ -800,11 +911,7 @@ async def admin_share_url(callback: CallbackQuery, state: FSMContext) -> None:
         db.DEFAULT_SETTINGS.get("share_button_url", ""),
     ) or ""
 
-    builder = InlineKeyboardBuilder()
-    builder.button(text="❌ Bekor qilish", callback_data="admin_share_url_cancel")
-    builder.adjust(1)
-
-    display_url = html.escape(current_url) if current_url else "<i>Havola kiritilmagan</i>"
+    display_url = _esc(current_url) if current_url else "<i>Havola kiritilmagan</i>"
 
     if callback.message:
         try:
@@ -813,7 +920,7 @@ async def admin_share_url(callback: CallbackQuery, state: FSMContext) -> None:
                 f"Amaldagi havola: {display_url}\n\n"
                 "Yangi havolani yuboring (http/https/tg://).\n"
                 "➡️ Havolani o'chirish uchun <code>o'chirish</code> deb yozing.",
-                reply_markup=builder.as_markup(),
+                reply_markup=_CANCEL_SHARE_URL_KB,
                 parse_mode="HTML",
                 disable_web_page_preview=True,
             )
@@ -822,13 +929,13 @@ async def admin_share_url(callback: CallbackQuery, state: FSMContext) -> None:
                 "🔗 Tugma havolasini tahrirlash\n\n"
                 f"Amaldagi havola: {current_url or '-'}\n\n"
                 "Yangi havolani yuboring (http/https/tg://).",
-                reply_markup=builder.as_markup(),
+                reply_markup=_CANCEL_SHARE_URL_KB,
             )
 
 
 @admin_router.callback_query(F.data == "admin_share_url_cancel")
 async def admin_share_url_cancel(callback: CallbackQuery, state: FSMContext) -> None:
-    if not await _ensure_admin(callback):
+    if not await _ensure_admin_cb(callback):
         return
     await state.clear()
     await callback.answer("Bekor qilindi.", show_alert=False)
@@ -849,7 +956,7 @@ async def admin_share_url_cancel(callback: CallbackQuery, state: FSMContext) ->
 
 @admin_router.callback_query(F.data == "admin_share_back")
 async def admin_share_back(callback: CallbackQuery) -> None:
-    if not await _ensure_admin(callback):
+    if not await _ensure_admin_cb(callback):
         return
     await callback.answer("Sozlamalar yopildi.")
     if callback.message:
@@ -862,9 +969,9 @@ async def admin_share_back(callback: CallbackQuery) -> None:
                 pass
 @admin_router.callback_query(F.data == "admin_add")
 async def admin_add_callback(callback: CallbackQuery, state: FSMContext) -> None:
-    if not await _ensure_admin(callback):
+    if not await _ensure_admin_cb(callback):
         return
-    if not _is_main_admin(callback.from_user.id if callback.from_user else 0):
+    if not _is_main_admin(_uid(callback)):
         await callback.answer("Faqat asosiy admin qo'sha oladi.", show_alert=True)
         return
     await state.set_state(AdminManageState.waiting_for_user)
@@ -876,10 +983,11 @@ async def admin_add_callback(callback: CallbackQuery, state: FSMContext) -> None
 
 
 @admin_router.message(AdminManageState.waiting_for_user)
+@_serialized_per_user
 async def process_admin_add(message: Message, state: FSMContext) -> None:
-    if not await _ensure_admin(message):
+    if not await _ensure_admin_msg(message):
         return
-    if not _is_main_admin(message.from_user.id if message.from_user else 0):
+    if not _is_main_admin(_uid(message)):
         await message.answer("Faqat asosiy admin o'zgartira oladi.")
         await state.clear()
         return
@@ -910,17 +1018,34 @@ async def process_admin_add(message: Message, state: FSMContext) -> None:
         await message.answer("Foydalanuvchi aniqlanmadi.")
         return
 
-    db.add_admin(target_user_id, username)
-    db.add_log(message.from_user.id if message.from_user else None, f"admin_add:{target_user_id}")
+    await _db(db.add_admin, target_user_id, username)
+    db.add_log_async(message.from_user.id if message.from_user else None, f"admin_add:{target_user_id}")
     await message.answer("✅ Admin muvaffaqiyatli qo'shildi.")
     await state.clear()
 
 
+def _admin_remove_kb(admins: list[dict]) -> InlineKeyboardMarkup:
+    """Removal keyboard: every admin except the main one, one per row."""
+    main_admin_id = _main_admin_id()
+    entries = [
+        (row["user_id"], row["username"] or str(row["user_id"]))
+        for row in admins
+        if row["user_id"] != main_admin_id
+    ]
+    builder = InlineKeyboardBuilder()
+    for user_id, name in entries:
+        builder.button(text=f"❌ {name}", callback_data=f"admin_remove:{user_id}")
+    builder.button(text="🔙 Orqaga", callback_data="admin_back_to_admin_menu")
+    builder.adjust(1)
+    return builder.as_markup()
+
+
 @admin_router.callback_query(F.data.startswith("admin_remove:"))
+@_serialized_per_user
 async def admin_remove_callback(callback: CallbackQuery) -> None:
-    if not await _ensure_admin(callback):
+    if not await _ensure_admin_cb(callback):
         return
-    if not _is_main_admin(callback.from_user.id if callback.from_user else 0):
+    if not _is_main_admin(_uid(callback)):
         await callback.answer("Faqat asosiy admin o'chira oladi.", show_alert=True)
         return
     _, _, user_id_str = callback.data.partition(":")
@@ -928,63 +1053,44 @@ async def admin_remove_callback(callback: CallbackQuery) -> None:
         await callback.answer("Noto'g'ri ma'lumot.", show_alert=True)
         return
     user_id = int(user_id_str)
-    main_admin_id = get_settings().main_admin_id
+    main_admin_id = _main_admin_id()
     if user_id == main_admin_id:
         await callback.answer("Asosiy adminni o'chirish mumkin emas.", show_alert=True)
         return
-    db.remove_admin(user_id)
-    db.add_log(callback.from_user.id if callback.from_user else None, f"admin_remove:{user_id}")
+    await _db(db.remove_admin, user_id)
+    db.add_log_async(callback.from_user.id if callback.from_user else None, f"admin_remove:{user_id}")
     await callback.answer("✅ Admin o'chirildi.", show_alert=True)
-    admins = db.get_admins()
-    main_admin_id = get_settings().main_admin_id
-    
+    if not callback.message:
+        return
+
+    admins = await _db(db.get_admins)
+
     text = "❌ <b>Admin o'chirish</b>\n\nO'chirmoqchi bo'lgan adminni tanlang:"
-    
-    builder = InlineKeyboardBuilder()
-    for admin in admins:
-        admin_id = admin.get("user_id")
-        if admin_id == main_admin_id:
-            continue  # Skip main admin
-        username = admin.get("username") or str(admin_id)
-        builder.button(
-            text=f"❌ {username}",
-            callback_data=f"admin_remove:{admin_id}"
-        )
-    builder.button(text="🔙 Orqaga", callback_data="admin_back_to_admin_menu")
-    builder.adjust(1)
-    
-    if callback.message:
-        try:
-            await callback.message.edit_text(
-                text,
-                reply_markup=builder.as_markup(),
-                parse_mode="HTML"
-            )
-        except TelegramBadRequest:
-            pass
+    markup = _admin_remove_kb(admins)
+
+    try:
+        await callback.message.edit_text(text, reply_markup=markup, parse_mode="HTML")
+    except TelegramBadRequest:
+        pass
 
 
-@admin_router.message(F.text == "📨 Xabar yuborish")
 async def admin_broadcast_entry(message: Message, state: FSMContext) -> None:
-    if not await _ensure_admin(message):
+    if not await _ensure_admin_msg(message):
         return
     await state.set_state(BroadcastState.waiting_for_content)
-    cancel_builder = InlineKeyboardBuilder()
-    cancel_builder.button(text="❌ Bekor qilish", callback_data="admin_broadcast_cancel")
-    cancel_builder.adjust(1)
     await message.answer(
         "📨 <b>Ommaviy xabar yuborish</b>\n\n"
         "Jo'natmoqchi bo'lgan xabaringizni shu yerga yuboring. Bot xabarni barcha foydalanuvchilarga yetkazadi.\n"
         "✅ Qabul qilinadigan formatlar: matn, foto, video, fayl.\n"
         "❌ Jarayonni to'xtatish uchun pastdagi <code>Bekor</code> tugmasini bosing yoki shu so'zni yozing.",
         parse_mode="HTML",
-        reply_markup=cancel_builder.as_markup(),
+        reply_markup=_BROADCAST_CANCEL_KB,
     )
 
 
 @admin_router.message(BroadcastState.waiting_for_content)
 async def admin_broadcast_collect(message: Message, state: FSMContext) -> None:
-    if not await _ensure_admin(message):
+    if not await _ensure_admin_msg(message):
         await state.clear()
         return
     if (message.text or "").lower() == "bekor":
@@ -1006,14 +1112,21 @@ async def admin_broadcast_collect(message: Message, state: FSMContext) -> None:
     )
 
 
+# Markup built for the broadcast preview, kept in-process so the
+# confirm step reuses it instead of rebuilding from FSM data.
+_broadcast_markups: dict[int, Optional[InlineKeyboardMarkup]] = {}
+
+
 @admin_router.callback_query(F.data == "admin_broadcast_cancel")
 async def admin_broadcast_cancel(callback: CallbackQuery, state: FSMContext, bot: Bot) -> None:
     """Cancel broadcast flow from inline button."""
-    if not await _ensure_admin(callback):
+    if not await _ensure_admin_cb(callback):
         return
     data = await state.get_data()
     await _cleanup_broadcast_preview(bot, data or {})
     await state.clear()
+    if callback.from_user:
+        _broadcast_markups.pop(callback.from_user.id, None)
     await callback.answer("Jarayon bekor qilindi.", show_alert=False)
     if callback.message:
         try:
@@ -1024,7 +1137,7 @@ async def admin_broadcast_cancel(callback: CallbackQuery, state: FSMContext, bot
 
 @admin_router.message(BroadcastState.waiting_for_buttons)
 async def admin_broadcast_buttons(message: Message, state: FSMContext, bot: Bot) -> None:
-    if not await _ensure_admin(message):
+    if not await _ensure_admin_msg(message):
         await state.clear()
         return
 
@@ -1068,28 +1181,24 @@ async def admin_broadcast_buttons(message: Message, state: FSMContext, bot: Bot)
         await state.clear()
         return
 
+    if message.from_user:
+        _broadcast_markups[message.from_user.id] = reply_markup
     await state.update_data(
         buttons=button_rows,
         preview_chat=preview.chat.id,
         preview_message=preview.message_id,
     )
 
-    confirm_builder = InlineKeyboardBuilder()
-    confirm_builder.button(text="✅ Tasdiqlash", callback_data="admin_broadcast_confirm")
-    confirm_builder.button(text="♻️ Tugmalarni qayta kiritish", callback_data="admin_broadcast_retry")
-    confirm_builder.button(text="❌ Bekor qilish", callback_data="admin_broadcast_cancel")
-    confirm_builder.adjust(1)
-
     await state.set_state(BroadcastState.waiting_for_confirm)
     await message.answer(
         "Yuqoridagi xabar barcha foydalanuvchilarga yuboriladi. Tasdiqlaysizmi?",
-        reply_markup=confirm_builder.as_markup(),
+        reply_markup=_BROADCAST_CONFIRM_KB,
     )
 
 
 @admin_router.callback_query(F.data == "admin_broadcast_confirm")
 async def admin_broadcast_confirm(callback: CallbackQuery, state: FSMContext, bot: Bot) -> None:
-    if not await _ensure_admin(callback):
+    if not await _ensure_admin_cb(callback):
         return
 
     current_state = await state.get_state()
@@ -1105,8 +1214,11 @@ async def admin_broadcast_confirm(callback: CallbackQuery, state: FSMContext, bo
         await state.clear()
         return
 
-    button_rows = data.get("buttons") or []
-    reply_markup = _build_buttons_markup(button_rows)
+    initiator = _uid(callback)
+    reply_markup = _broadcast_markups.pop(initiator, None)
+    if reply_markup is None:
+        # Fallback for the rare case the in-process entry is gone.
+        reply_markup = _build_buttons_markup(data.get("buttons") or [])
 
     await _cleanup_broadcast_preview(bot, data)
     await state.clear()
@@ -1131,7 +1243,7 @@ async def admin_broadcast_confirm(callback: CallbackQuery, state: FSMContext, bo
 
 @admin_router.callback_query(F.data == "admin_broadcast_retry")
 async def admin_broadcast_retry(callback: CallbackQuery, state: FSMContext, bot: Bot) -> None:
-    if not await _ensure_admin(callback):
+    if not await _ensure_admin_cb(callback):
         return
 
     current_state = await state.get_state()
@@ -1142,6 +1254,8 @@ async def admin_broadcast_retry(callback: CallbackQuery, state: FSMContext, bot:
     data = await state.get_data()
     await _cleanup_broadcast_preview(bot, data)
 
+    if callback.from_user:
+        _broadcast_markups.pop(callback.from_user.id, None)
     await state.update_data(buttons=[], preview_chat=None, preview_message=None)
     await state.set_state(BroadcastState.waiting_for_buttons)
 
@@ -1159,8 +1273,9 @@ async def admin_broadcast_retry(callback: CallbackQuery, state: FSMContext, bot:
 
 
 @admin_router.message(SettingsState.waiting_for_share_button_text)
+@_serialized_per_user
 async def admin_save_share_button_text(message: Message, state: FSMContext) -> None:
-    if not await _ensure_admin(message):
+    if not await _ensure_admin_msg(message):
         await state.clear()
         return
 
@@ -1183,8 +1298,9 @@ async def admin_save_share_button_text(message: Message, state: FSMContext) -> N
             return
         new_text = raw_text
 
-    db.set_setting("share_button_text", new_text)
-    db.add_log(message.from_user.id if message.from_user else None, "share_button_text_update")
+    await _db(db.set_setting, "share_button_text", new_text)
+    _invalidate_share_overview()
+    db.add_log_async(message.from_user.id if message.from_user else None, "share_button_text_update")
     await message.answer("✅ Tugma matni yangilandi.")
     await state.clear()
 
@@ -1198,8 +1314,9 @@ async def admin_save_share_button_text(message: Message, state: FSMContext) -> N
 
 
 @admin_router.message(SettingsState.waiting_for_share_button_url)
+@_serialized_per_user
 async def admin_save_share_button_url(message: Message, state: FSMContext) -> None:
-    if not await _ensure_admin(message):
+    if not await _ensure_admin_msg(message):
         await state.clear()
         return
 
@@ -1212,8 +1329,9 @@ async def admin_save_share_button_url(message: Message, state: FSMContext) -> No
         return
 
     if lower_input in {"o'chirish", "ochirish", "off", "0"}:
-        db.set_setting("share_button_url", "")
-        db.add_log(message.from_user.id if message.from_user else None, "share_button_url_cleared")
+        await _db(db.set_setting, "share_button_url", "")
+        _invalidate_share_overview()
+        db.add_log_async(message.from_user.id if message.from_user else None, "share_button_url_cleared")
         await message.answer("ℹ️ Havola o'chirildi. Tugma havolasiz ko'rsatilmaydi.")
         await state.clear()
     else:
@@ -1223,8 +1341,9 @@ async def admin_save_share_button_url(message: Message, state: FSMContext) -> No
                 "❌ Havola noto'g'ri. U http://, https:// yoki tg:// bilan boshlanishi kerak."
             )
             return
-        db.set_setting("share_button_url", prepared)
-        db.add_log(message.from_user.id if message.from_user else None, "share_button_url_update")
+        await _db(db.set_setting, "share_button_url", prepared)
+        _invalidate_share_overview()
+        db.add_log_async(message.from_user.id if message.from_user else None, "share_button_url_update")
         await message.answer("✅ Havola muvaffaqiyatli yangilandi.")
         await state.clear()
 
@@ -1239,7 +1358,7 @@ async def admin_save_share_button_url(message: Message, state: FSMContext) -> No
 
 @admin_router.message(SettingsState.waiting_for_start_text)
 async def admin_save_start_text(message: Message, state: FSMContext) -> None:
-    if not await _ensure_admin(message):
+    if not await _ensure_admin_msg(message):
         await state.clear()
         return
     text = (message.text or "").strip()
@@ -1250,15 +1369,15 @@ async def admin_save_start_text(message: Message, state: FSMContext) -> None:
     if not text:
         await message.answer("Matn bo'sh bo'lmasligi kerak.")
         return
-    db.set_setting("start_text", text)
-    db.add_log(message.from_user.id if message.from_user else None, "start_text_update")
+    await _db(db.set_setting, "start_text", text)
+    db.add_log_async(message.from_user.id if message.from_user else None, "start_text_update")
     await message.answer("✅ Xush kelibsiz matni yangilandi.")
     await state.clear()
 
 
 @admin_router.message(SettingsState.waiting_for_subscription_text)
 async def admin_save_subscription_text(message: Message, state: FSMContext) -> None:
-    if not await _ensure_admin(message):
+    if not await _ensure_admin_msg(message):
         await state.clear()
         return
     text = (message.text or "").strip()
@@ -1269,8 +1388,8 @@ async def admin_save_subscription_text(message: Message, state: FSMContext) -> N
     if not text:
         await message.answer("Matn bo'sh bo'lmasligi kerak.")
         return
-    db.set_setting("subscribe_text", text)
-    db.add_log(message.from_user.id if message.from_user else None, "subscribe_text_update")
+    await _db(db.set_setting, "subscribe_text", text)
+    db.add_log_async(message.from_user.id if message.from_user else None, "subscribe_text_update")
     await message.answer("✅ Obuna talabi xabari yangilandi.")
     await state.clear()
 
@@ -1280,37 +1399,61 @@ async def admin_backup_command(message: Message) -> None:
     await _admin_backup(message)
 
 
-@admin_router.message(F.text == "📂 Backup")
 async def admin_backup(message: Message) -> None:
     await _admin_backup(message)
 
 
+@contextlib.asynccontextmanager
+async def _chat_action(bot: Optional[Bot], chat_id: int, action: str = "upload_document"):
+    """Keep a chat action visible while a slow operation runs."""
+    if bot is None:
+        yield
+        return
+
+    async def _pinger() -> None:
+        while True:
+            with contextlib.suppress(TelegramBadRequest):
+                await bot.send_chat_action(chat_id, action)
+            await asyncio.sleep(4)
+
+    task = asyncio.create_task(_pinger())
+    try:
+        yield
+    finally:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+
 async def _admin_backup(message: Message) -> None:
-    if not await _ensure_admin(message):
+    if not await _ensure_admin_msg(message):
         return
-    
+
     try:
         # Show progress
         status_msg = await message.answer("📂 Zaxira nusxa tayyorlanmoqda...")
-        
-        backup_path = create_database_backup()
-        backup_size = backup_path.stat().st_size / 1024  # KB
-        
-        # Get database stats for caption
-        counts = db.get_user_counts()
-        
+
+        async with _chat_action(message.bot, message.chat.id):
+            backup_path = await asyncio.to_thread(create_database_backup)
+            backup_size = await asyncio.to_thread(
+                lambda: backup_path.stat().st_size / 1024  # KB
+            )
+
+            # Get database stats for caption
+            counts = await _db(db.get_user_counts)
+
         caption = (
             f"📂 <b>Bot ma'lumotlari zaxirasi</b>\n\n"
             f"📊 <b>Statistika:</b>\n"
             f"• Foydalanuvchilar: {counts['total_users']}\n"
             f"• Yuklab olishlar: {counts['total_downloads']}\n"
             f"• Fayl hajmi: {backup_size:.1f} KB\n"
-            f"• Sanasi: {datetime.now().strftime('%d.%m.%Y %H:%M')}\n\n"
+            f"• Sanasi: {_now_stamp()}\n\n"
             f"💾 Zaxira nusxa muvaffaqiyatli yaratildi!"
         )
         
         await status_msg.delete()
-        db.add_log(message.from_user.id if message.from_user else None, "backup_created")
+        db.add_log_async(message.from_user.id if message.from_user else None, "backup_created")
         await message.answer_document(FSInputFile(backup_path), caption=caption)
         
     except FileNotFoundError:
@@ -1321,14 +1464,13 @@ async def _admin_backup(message: Message) -> None:
         
 
 
-@admin_router.message(F.text == "🕒 Uptime")
 async def admin_uptime(message: Message) -> None:
-    if not await _ensure_admin(message):
+    if not await _ensure_admin_msg(message):
         return
     
     try:
         uptime = format_uptime()
-        counts = db.get_user_counts()
+        counts = await _db(db.get_user_counts)
         
         uptime_text = (
             f"🕒 <b>Bot holati</b>\n\n"
@@ -1338,7 +1480,7 @@ async def admin_uptime(message: Message) -> None:
             f"   • Jami foydalanuvchilar: {counts['total_users']}\n"
             f"   • Bugun faol: {counts['active_today']}\n"
             f"   • Yuklab olishlar: {counts['total_downloads']}\n\n"
-            f"📅 <b>Tekshirilgan:</b> {datetime.now().strftime('%d.%m.%Y %H:%M')}"
+            f"📅 <b>Tekshirilgan:</b> {_now_stamp()}"
         )
         await message.answer(uptime_text)
         
@@ -1351,76 +1493,53 @@ async def admin_uptime(message: Message) -> None:
 @admin_router.message(Command("ping"))
 @admin_router.message(Command("uptime"))
 async def admin_ping(message: Message) -> None:
-    if not await _ensure_admin(message):
+    if not await _ensure_admin_msg(message):
         return
     await message.answer(f"✅ Bot faol. Uptime: {format_uptime()}")
 
 
-@admin_router.message(F.text == "🔙 Ortga")
 async def admin_back(message: Message) -> None:
-    if not await _ensure_admin(message):
+    if not await _ensure_admin_msg(message):
         return
     await message.answer("Bosh menyu.", reply_markup=admin_main_reply_kb())
 
 
-@admin_router.message(F.text == "🧪 Test")
+async def _run_check(name: str, fn: Callable) -> str:
+    """Run one diagnostic (sync helpers go to a thread) and label it."""
+    try:
+        result = await asyncio.to_thread(fn)
+        if inspect.isawaitable(result):
+            await result
+        return f"✅ {name} - <b>ISHLAYDI</b>"
+    except Exception as e:
+        return f"❌ {name} - <b>XATO:</b> {e}"
+
+
 async def admin_test_functions(message: Message, bot: Bot) -> None:
-    if not await _ensure_admin(message):
+    if not await _ensure_admin_msg(message):
         return
-    
+
     test_msg = await message.answer("🧪 <b>Admin panel funksiyalari tekshirilmoqda...</b>")
-    results = []
-    
-    # Test database connection
-    try:
-        db.get_user_counts()
-        results.append("✅ Ma'lumotlar bazasi - <b>ISHLAYDI</b>")
-    except Exception as e:
-        results.append(f"❌ Ma'lumotlar bazasi - <b>XATO:</b> {e}")
-    
-    # Test statistics
-    try:
-        build_stats_overview()
-        results.append("✅ Statistika tizimi - <b>ISHLAYDI</b>")
-    except Exception as e:
-        results.append(f"❌ Statistika tizimi - <b>XATO:</b> {e}")
-    
-    # Test backup system
-    try:
-        create_database_backup()
-        results.append("✅ Backup tizimi - <b>ISHLAYDI</b>")
-    except Exception as e:
-        results.append(f"❌ Backup tizimi - <b>XATO:</b> {e}")
-    
-    # Test uptime
-    try:
-        format_uptime()
-        results.append("✅ Uptime tizimi - <b>ISHLAYDI</b>")
-    except Exception as e:
-        results.append(f"❌ Uptime tizimi - <b>XATO:</b> {e}")
-    
-    # Test profile update
-    try:
-        await update_bot_monthly_users_badge(bot)
-        results.append("✅ Profil yangilash - <b>ISHLAYDI</b>")
-    except Exception as e:
-        results.append(f"❌ Profil yangilash - <b>XATO:</b> {e}")
-    
-    # Test settings
-    try:
-        db.get_setting("start_text")
-        results.append("✅ Sozlamalar tizimi - <b>ISHLAYDI</b>")
-    except Exception as e:
-        results.append(f"❌ Sozlamalar tizimi - <b>XATO:</b> {e}")
-    
+
+    # Checks are independent; run them concurrently so the panel
+    # answers in the time of the slowest check, not the sum.
+    results = await asyncio.gather(
+        _run_check("Ma'lumotlar bazasi", db.get_user_counts),
+        _run_check("Statistika tizimi", build_stats_overview),
+        _run_check("Backup tizimi", create_database_backup),
+        _run_check("Uptime tizimi", format_uptime),
+        _run_check("Profil yangilash", lambda: update_bot_monthly_users_badge(bot)),
+        _run_check("Sozlamalar tizimi", lambda: db.get_setting("start_text")),
+    )
+
     test_result = (
         f"🧪 <b>Admin panel test natijalari</b>\n\n"
         + "\n".join(results) + 
-        f"\n\n📅 <b>Test sanasi:</b> {datetime.now().strftime('%d.%m.%Y %H:%M')}"
+        f"\n\n📅 <b>Test sanasi:</b> {_now_stamp()}"
     )
     
     await test_msg.edit_text(test_result)
-    db.add_log(message.from_user.id if message.from_user else None, "admin_test_completed")
+    db.add_log_async(message.from_user.id if message.from_user else None, "admin_test_completed")
 
 
 @admin_router.callback_query(F.data == "noop")
@@ -1428,50 +1547,96 @@ async def admin_noop(callback: CallbackQuery) -> None:
     await callback.answer("Bu amal faqat asosiy admin uchun.", show_alert=True)
 
 
-async def _ensure_admin(event: Message | CallbackQuery) -> bool:
-    user = event.from_user if isinstance(event, CallbackQuery) else event.from_user
+async def _ensure_admin_cb(callback: CallbackQuery) -> bool:
+    """Admin gate for callback queries (no event-type dispatch)."""
+    user = callback.from_user
     if not user:
-        if isinstance(event, CallbackQuery):
-            await event.answer("Foydalanuvchi topilmadi.", show_alert=True)
+        await callback.answer("Foydalanuvchi topilmadi.", show_alert=True)
         return False
     if not db.is_admin(user.id):
-        text = "Bu bo'lim faqat adminlar uchun."
-        if isinstance(event, CallbackQuery):
-            await event.answer(text, show_alert=True)
-        else:
-            await event.answer(text)
+        await callback.answer("Bu bo'lim faqat adminlar uchun.", show_alert=True)
         return False
     return True
 
 
+async def _ensure_admin_msg(message: Message) -> bool:
+    """Admin gate for plain messages (no event-type dispatch)."""
+    user = message.from_user
+    if not user:
+        return False
+    if not db.is_admin(user.id):
+        await message.answer("Bu bo'lim faqat adminlar uchun.")
+        return False
+    return True
+
+
+async def _ensure_admin(event: Message | CallbackQuery) -> bool:
+    """Compatibility shim; prefer the event-specific variants above."""
+    if isinstance(event, CallbackQuery):
+        return await _ensure_admin_cb(event)
+    return await _ensure_admin_msg(event)
+
+
+async def _db(fn, *args, **kwargs):
+    """Run a blocking database helper off the event loop."""
+    return await asyncio.to_thread(fn, *args, **kwargs)
+
+
+_MAIN_ADMIN_ID: Optional[int] = None
+
+
+def _main_admin_id() -> int:
+    """Main admin id frozen on first use (constant for the process).
+
+    Resolved lazily rather than at import so the module can be loaded
+    before the environment is configured.
+    """
+    global _MAIN_ADMIN_ID
+    if _MAIN_ADMIN_ID is None:
+        _MAIN_ADMIN_ID = get_settings().main_admin_id
+    return _MAIN_ADMIN_ID
+
+
+def _uid(event) -> int:
+    """Event sender id, 0 when Telegram omits from_user."""
+    user = event.from_user
+    return user.id if user else 0
+
+
 def _is_main_admin(user_id: int) -> bool:
-    return user_id == get_settings().main_admin_id
+    return user_id == _main_admin_id()
+
+
+# One 'Sarlavha - https://havola' segment, optionally ending at a '|'.
+# Splitting at the dash directly before the URL also lets titles contain
+# hyphens, which the old split("-", 1) mangled.
+_BUTTON_RE = re.compile(r"\s*([^|]+?)\s*-\s*(https?://\S+)\s*(?:\||$)")
 
 
 def _parse_buttons(text: str) -> list[list[dict[str, str]]]:
-    lines = [line.strip() for line in text.splitlines() if line.strip()]
-    if not lines:
+    if not text.strip():
         raise ValueError("Tugmalar ro'yxati bo'sh.")
 
     rows: list[list[dict[str, str]]] = []
-    for line in lines:
-        segments = [segment.strip() for segment in line.split("|") if segment.strip()]
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        segments = [segment for segment in line.split("|") if segment.strip()]
         if not segments:
             continue
 
-        row: list[dict[str, str]] = []
-        for segment in segments:
-            if "-" not in segment:
-                raise ValueError("Har satr 'Sarlavha - havola' formatida bo'lishi kerak.")
-            title, url = [part.strip() for part in segment.split("-", 1)]
-            if not title:
+        row = [
+            {"text": match.group(1), "url": match.group(2)}
+            for match in _BUTTON_RE.finditer(line)
+        ]
+        if len(row) != len(segments):
+            if any(segment.strip().startswith("-") for segment in segments):
                 raise ValueError("Tugma sarlavhasi bo'sh bo'lishi mumkin emas.")
-            if not url.startswith(("http://", "https://")):
-                raise ValueError("Havola 'http://' yoki 'https://' bilan boshlanishi kerak.")
-            row.append({"text": title, "url": url})
-
-        if row:
-            rows.append(row)
+            if any("-" not in segment for segment in segments):
+                raise ValueError("Har satr 'Sarlavha - havola' formatida bo'lishi kerak.")
+            raise ValueError("Havola 'http://' yoki 'https://' bilan boshlanishi kerak.")
+        rows.append(row)
 
     if not rows:
         raise ValueError("Yaroqli tugmalar topilmadi.")
@@ -1483,18 +1648,17 @@ def _build_buttons_markup(button_rows: list[list[dict[str, str]]]) -> InlineKeyb
     if not button_rows:
         return None
 
-    builder = InlineKeyboardBuilder()
-    for row in button_rows:
-        buttons = [InlineKeyboardButton(text=button["text"], url=button["url"]) for button in row]
-        builder.row(*buttons)
-    return builder.as_markup()
+    # Titles and URLs are already validated by _parse_buttons, so skip
+    # pydantic validation on the rebuild.
+    rows = [
+        [InlineKeyboardButton.model_construct(text=button["text"], url=button["url"]) for button in row]
+        for row in button_rows
+    ]
+    return InlineKeyboardMarkup.model_construct(inline_keyboard=rows)
 
 
 def _broadcast_cancel_keyboard() -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
-    builder.button(text="❌ Bekor qilish", callback_data="admin_broadcast_cancel")
-    builder.adjust(1)
-    return builder.as_markup()
+    return _BROADCAST_CANCEL_KB
 
 
 def _broadcast_buttons_instructions() -> str:
@@ -1519,6 +1683,12 @@ async def _cleanup_broadcast_preview(bot: Bot, data: dict) -> None:
         pass
 
 
+def _now_stamp() -> str:
+    """Minute-granularity timestamp without the strftime machinery."""
+    now = datetime.now()
+    return f"{now.day:02d}.{now.month:02d}.{now.year} {now.hour:02d}:{now.minute:02d}"
+
+
 def _format_last_active(value: Optional[str]) -> str:
     if not value:
         return "noma'lum"
@@ -1532,6 +1702,31 @@ def _format_last_active(value: Optional[str]) -> str:
     return moment.strftime("%d.%m %H:%M")
 
 
+# Target just under Telegram's ~30 msg/s bot-wide allowance.
+_BROADCAST_RATE = 28
+
+# Concurrent in-flight sends; hides HTTP round-trip latency while the
+# throttle window still enforces the global rate.
+_BROADCAST_CONCURRENCY = 20
+
+# Recipients gathered per batch so progress updates run between batches.
+_BROADCAST_CHUNK = 500
+
+# Minimum wall-clock gap between progress edits; edits count against the
+# same Telegram rate budget as the deliveries themselves.
+_BROADCAST_EDIT_INTERVAL = 2.0
+
+
+async def _broadcast_throttle(window: deque[float]) -> None:
+    """Token-bucket pacing: wait until the oldest of the last N sends
+    falls outside the one-second window."""
+    if len(window) == window.maxlen:
+        wait = window[0] + 1.0 - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+    window.append(time.monotonic())
+
+
 async def _execute_broadcast(
     *,
     bot: Bot,
@@ -1541,8 +1736,7 @@ async def _execute_broadcast(
     reply_markup,
     initiator: Optional[int],
 ) -> None:
-    user_ids = list(db.iter_user_ids())
-    total = len(user_ids)
+    total = await _db(db.count_users)
     if total == 0:
         await bot.send_message(admin_chat, "Foydalanuvchilar ro'yxati bo'sh.")
         return
@@ -1550,30 +1744,58 @@ async def _execute_broadcast(
     progress = await bot.send_message(admin_chat, f"📨 Jo'natish boshlandi: 0/{total}")
     success = 0
     failed = 0
-
-    for index, user_id in enumerate(user_ids, start=1):
-        try:
-            await bot.copy_message(
-                chat_id=user_id,
-                from_chat_id=source_chat,
-                message_id=source_message,
-                reply_markup=reply_markup,
-            )
-            success += 1
-        except (TelegramForbiddenError, TelegramBadRequest):
-            failed += 1
-        except Exception as error:  # pragma: no cover
-            logging.exception("Broadcast xatosi", exc_info=error)
-            failed += 1
-
-        if index % 10 == 0 or index == total:
+    errors: list[tuple[int, str]] = []
+    window: deque[float] = deque(maxlen=_BROADCAST_RATE)
+    semaphore = asyncio.Semaphore(_BROADCAST_CONCURRENCY)
+
+    async def _send(user_id: int) -> None:
+        nonlocal success, failed
+        async with semaphore:
+            await _broadcast_throttle(window)
             try:
-                await progress.edit_text(
-                    f"📨 Jarayon: {success}/{total} | Xatoliklar: {failed}"
+                await bot.copy_message(
+                    chat_id=user_id,
+                    from_chat_id=source_chat,
+                    message_id=source_message,
+                    reply_markup=reply_markup,
                 )
-            except TelegramBadRequest:
-                pass
-        await asyncio.sleep(0.05)
+                success += 1
+            except (TelegramForbiddenError, TelegramBadRequest):
+                failed += 1
+            except Exception as error:  # pragma: no cover
+                # Collected and logged once after the run; formatting a
+                # traceback per blocked user is wasted work at scale.
+                errors.append((user_id, repr(error)))
+                failed += 1
+
+    # Stream ids straight off the cursor instead of materializing the list.
+    user_ids = db.iter_user_ids()
+    done = 0
+    last_edit = 0.0
+    last_text = ""
+    while True:
+        chunk = await asyncio.to_thread(lambda: list(islice(user_ids, _BROADCAST_CHUNK)))
+        if not chunk:
+            break
+        await asyncio.gather(*(_send(user_id) for user_id in chunk))
+        done += len(chunk)
+        now = time.monotonic()
+        if now - last_edit < _BROADCAST_EDIT_INTERVAL:
+            continue
+        text = f"📨 Jarayon: {success}/{total} | Xatoliklar: {failed}"
+        if text == last_text:
+            continue
+        last_edit = now
+        last_text = text
+        try:
+            await progress.edit_text(text)
+        except TelegramBadRequest:
+            pass
+
+    if errors and logging.getLogger().isEnabledFor(logging.ERROR):
+        logging.error(
+            "Broadcastda %d kutilmagan xato, namuna: %s", len(errors), errors[:5]
+        )
 
     try:
         await progress.edit_text(
@@ -1581,141 +1803,106 @@ async def _execute_broadcast(
         )
     except TelegramBadRequest:
         pass
-    db.add_log(initiator, f"broadcast_sent:{success}:{failed}")
+    db.add_log_async(initiator, f"broadcast_sent:{success}:{failed}")
+
+
+async def _edit_or_resend(
+    callback: CallbackQuery, text: str, markup: Optional[InlineKeyboardMarkup] = None
+) -> None:
+    """Edit the callback message in place, resending if the edit fails."""
+    message = callback.message
+    if not message:
+        return
+    try:
+        await message.edit_text(text, reply_markup=markup, parse_mode="HTML")
+    except TelegramBadRequest:
+        with contextlib.suppress(TelegramBadRequest):
+            await message.delete()
+        await message.answer(text, reply_markup=markup, parse_mode="HTML")
 
 
 # New callback handlers for admin management
 @admin_router.callback_query(F.data == "admin_admins_list")
 async def admin_admins_list_callback(callback: CallbackQuery) -> None:
     """Show list of all admins."""
-    if not await _ensure_admin(callback):
+    if not await _ensure_admin_cb(callback):
         return
     await callback.answer()
     
-    text = _build_admins_list()
-    builder = InlineKeyboardBuilder()
-    builder.button(text="🔙 Orqaga", callback_data="admin_back_to_admin_menu")
-    builder.adjust(1)
-    
-    if callback.message:
-        try:
-            await callback.message.edit_text(text, reply_markup=builder.as_markup(), parse_mode="HTML")
-        except TelegramBadRequest:
-            await callback.message.answer(text, reply_markup=builder.as_markup(), parse_mode="HTML")
+    text = await _db(_build_admins_list)
+    await _edit_or_resend(callback, text, _BACK_TO_ADMIN_MENU_KB)
 
 
 @admin_router.callback_query(F.data == "admin_remove_select")
 async def admin_remove_select_callback(callback: CallbackQuery) -> None:
     """Show list of admins to remove."""
-    if not await _ensure_admin(callback):
+    if not await _ensure_admin_cb(callback):
         return
-    if not _is_main_admin(callback.from_user.id if callback.from_user else 0):
+    if not _is_main_admin(_uid(callback)):
         await callback.answer("Faqat asosiy admin o'chira oladi.", show_alert=True)
         return
     await callback.answer()
     
-    admins = db.get_admins()
-    main_admin_id = get_settings().main_admin_id
-    
+    admins = await _db(db.get_admins)
+
     text = "❌ <b>Admin o'chirish</b>\n\nO'chirmoqchi bo'lgan adminni tanlang:"
+    markup = _admin_remove_kb(admins)
     
-    builder = InlineKeyboardBuilder()
-    for admin in admins:
-        user_id = admin.get("user_id")
-        if user_id == main_admin_id:
-            continue  # Skip main admin
-        username = admin.get("username") or str(user_id)
-        builder.button(
-            text=f"❌ {username}",
-            callback_data=f"admin_remove:{user_id}"
-        )
-    builder.button(text="🔙 Orqaga", callback_data="admin_back_to_admin_menu")
-    builder.adjust(1)
-    
-    if callback.message:
-        try:
-            await callback.message.edit_text(text, reply_markup=builder.as_markup(), parse_mode="HTML")
-        except TelegramBadRequest as e:
-            # If edit fails, delete old message and send new one
-            logging.debug(f"Edit failed, deleting old message: {e}")
-            try:
-                await callback.message.delete()
-            except TelegramBadRequest:
-                pass
-            await callback.bot.send_message(
-                chat_id=callback.message.chat.id,
-                text=text,
-                reply_markup=builder.as_markup(),
-                parse_mode="HTML"
-            )
+    await _edit_or_resend(callback, text, markup)
 
 
 @admin_router.callback_query(F.data == "admin_back_to_main")
 async def admin_back_to_main_callback(callback: CallbackQuery) -> None:
     """Go back to main admin panel."""
-    if not await _ensure_admin(callback):
+    if not await _ensure_admin_cb(callback):
         return
     await callback.answer()
     
     if callback.message and callback.from_user:
         user_name = callback.from_user.first_name
-        welcome_text = (
-            f"👋 Assalomu alaykum, <b>{html.escape(user_name)}</b>!\n\n"
-            "🔧 <b>Admin panelga xush kelibsiz</b>\n"
-            "Quyidagi bo'limlardan birini tanlang:\n\n"
-            "📊 <i>Statistika</i> - Bot statistikalarini ko'rish\n"
-            " <i>Kanallar</i> - Majburiy obuna kanallarini boshqarish\n"
-            "👥 <i>Adminlar</i> - Admin huquqlarini boshqarish\n"
-            "📨 <i>Xabar yuborish</i> - Barcha foydalanuvchilarga xabar\n"
-            "📝 <i>Start matni</i> - Bot xush kelibsiz matnini o'zgartirish"
-        )
-        try:
-            await callback.message.edit_text(welcome_text, reply_markup=admin_main_reply_kb(), parse_mode="HTML")
-        except TelegramBadRequest:
-            await callback.message.answer(welcome_text, reply_markup=admin_main_reply_kb(), parse_mode="HTML")
+        welcome_text = _WELCOME_TEMPLATE.format_map({"name": _esc(user_name)})
+        await _edit_or_resend(callback, welcome_text, admin_main_reply_kb())
 
 
 @admin_router.callback_query(F.data == "admin_back_to_admin_menu")
 async def admin_back_to_admin_menu_callback(callback: CallbackQuery) -> None:
     """Go back to admin management menu."""
-    if not await _ensure_admin(callback):
+    if not await _ensure_admin_cb(callback):
         return
     await callback.answer()
     
-    builder = InlineKeyboardBuilder()
-    builder.button(text="📋 Adminlar ro'yxati", callback_data="admin_admins_list")
-    builder.button(text="➕ Admin qo'shish", callback_data="admin_add")
-    builder.button(text="❌ Admin o'chirish", callback_data="admin_remove_select")
-    builder.button(text="⚙️ Huquqlar", callback_data="admin_permissions_select")
-    builder.adjust(2, 2)
-    
-    text = (
-        "👑 <b>Admin boshqaruvi</b>\n\n"
-        "Quyidagi amallardan birini tanlang:"
-    )
-    
-    if callback.message:
-        try:
-            await callback.message.edit_text(text, reply_markup=builder.as_markup(), parse_mode="HTML")
-        except TelegramBadRequest:
-            await callback.message.answer(text, reply_markup=builder.as_markup(), parse_mode="HTML")
+    await _edit_or_resend(callback, _ADMIN_MENU_TEXT, _ADMIN_MENU_KB)
 
 
 # --------------------------- Admin Permissions Handlers ------------------------- #
 
 
+class PermManageCB(CallbackData, prefix="admin_perm_manage"):
+    """Open the permission view for one admin."""
+
+    user_id: int
+
+
+class PermToggleCB(CallbackData, prefix="admin_perm_toggle"):
+    """Flip a single permission flag; action is the new value (0/1)."""
+
+    user_id: int
+    permission: str
+    action: int
+
+
 @admin_router.callback_query(F.data == "admin_permissions_select")
 async def admin_permissions_select_callback(callback: CallbackQuery) -> None:
     """Show list of admins to manage permissions."""
-    if not await _ensure_admin(callback):
+    if not await _ensure_admin_cb(callback):
         return
-    if not _is_main_admin(callback.from_user.id if callback.from_user else 0):
+    if not _is_main_admin(_uid(callback)):
         await callback.answer("Faqat asosiy admin huquqlarni boshqara oladi.", show_alert=True)
         return
     await callback.answer()
     
-    admins = db.get_admins()
-    main_admin_id = get_settings().main_admin_id
+    admins = await _db(db.get_admins)
+    main_admin_id = _main_admin_id()
     
     text = "⚙️ <b>Admin huquqlarini boshqarish</b>\n\nHuquqlarini o'zgartirmoqchi bo'lgan adminni tanlang:"
     
@@ -1727,115 +1914,100 @@ async def admin_permissions_select_callback(callback: CallbackQuery) -> None:
         username = admin.get("username") or str(user_id)
         builder.button(
             text=f"👤 {username}",
-            callback_data=f"admin_perm_manage:{user_id}"
+            callback_data=PermManageCB(user_id=user_id),
         )
     builder.button(text="🔙 Orqaga", callback_data="admin_back_to_admin_menu")
     builder.adjust(1)
     
-    if callback.message:
-        # Try to edit the message first
-        try:
-            await callback.message.edit_text(text, reply_markup=builder.as_markup(), parse_mode="HTML")
-        except TelegramBadRequest as e:
-            # If edit fails, delete old message and send new one
-            logging.debug(f"Edit failed, deleting old message: {e}")
-            try:
-                await callback.message.delete()
-            except TelegramBadRequest:
-                pass
-            await callback.bot.send_message(
-                chat_id=callback.message.chat.id,
-                text=text,
-                reply_markup=builder.as_markup(),
-                parse_mode="HTML"
-            )
+    await _edit_or_resend(callback, text, builder.as_markup())
+
+
+# Permission labels in Uzbek; the short forms feed the toggle buttons
+# and the alert variants drop the emoji. Read-only proxies so handlers
+# can't mutate them by accident.
+PERM_NAMES = MappingProxyType({
+    'can_manage_users': '👥 Foydalanuvchilarni boshqarish',
+    'can_manage_channels': '📢 Kanallarni boshqarish',
+    'can_broadcast': '📨 Xabar yuborish',
+    'can_view_stats': '📊 Statistikani korish',
+    'can_manage_admins': '👑 Adminlarni boshqarish',
+})
+PERM_SHORT = MappingProxyType({key: name.split()[1] for key, name in PERM_NAMES.items()})
+PERM_NAMES_ALERT = MappingProxyType(
+    {key: name.split(maxsplit=1)[1] for key, name in PERM_NAMES.items()}
+)
+
+
+def _build_perm_view(user_id: int, username: str, perms: dict) -> tuple[str, InlineKeyboardMarkup]:
+    """Render the permissions text and toggle keyboard for one admin."""
+    lines = [f"⚙️ <b>Huquqlar: {username}</b>", ""]
+    builder = InlineKeyboardBuilder()
+    for perm_key, perm_name in PERM_NAMES.items():
+        has_perm = perms.get(perm_key, 0) == 1
+        status = "✅" if has_perm else "❌"
+        lines.append(f"{status} {perm_name}")
 
+        btn_action = "❌ O'chirish" if has_perm else "✅ Yoqish"
+        builder.button(
+            text=f"{btn_action}: {PERM_SHORT[perm_key]}",
+            callback_data=PermToggleCB(
+                user_id=user_id,
+                permission=perm_key,
+                action=0 if has_perm else 1,  # Toggle
+            ),
+        )
 
-@admin_router.callback_query(F.data.startswith("admin_perm_manage:"))
-async def admin_perm_manage_callback(callback: CallbackQuery) -> None:
+    builder.button(text="🔙 Orqaga", callback_data="admin_permissions_select")
+    builder.adjust(1)
+    return "\n".join(lines) + "\n", builder.as_markup()
+
+
+@admin_router.callback_query(PermManageCB.filter())
+async def admin_perm_manage_callback(callback: CallbackQuery, callback_data: PermManageCB) -> None:
     """Show permissions for a specific admin."""
-    if not await _ensure_admin(callback):
+    if not await _ensure_admin_cb(callback):
         return
-    if not _is_main_admin(callback.from_user.id if callback.from_user else 0):
+    if not _is_main_admin(_uid(callback)):
         await callback.answer("Faqat asosiy admin huquqlarni boshqara oladi.", show_alert=True)
         return
-    
-    user_id = int(callback.data.split(":", 1)[1])
+
+    user_id = callback_data.user_id
     await callback.answer()
     
-    # Get admin info
-    admins = db.get_admins()
-    admin_info = next((a for a in admins if a.get("user_id") == user_id), None)
+    # Admin row and permission flags arrive in one query.
+    admin_info = await _db(db.get_admin_with_permissions, user_id)
     if not admin_info:
         await callback.answer("Admin topilmadi", show_alert=True)
         return
-    
+
     username = admin_info.get("username") or str(user_id)
-    perms = db.get_admin_permissions(user_id)
-    
-    # Permission names in Uzbek
-    perm_names = {
-        'can_manage_users': '👥 Foydalanuvchilarni boshqarish',
-        'can_manage_channels': '📢 Kanallarni boshqarish',
-        'can_broadcast': '📨 Xabar yuborish',
-        'can_view_stats': '📊 Statistikani korish',
-        'can_manage_admins': '👑 Adminlarni boshqarish'
-    }
-    
-    text = f"⚙️ <b>Huquqlar: {username}</b>\n\n"
-    
-    builder = InlineKeyboardBuilder()
-    for perm_key, perm_name in perm_names.items():
-        has_perm = perms.get(perm_key, 0) == 1
-        status = "✅" if has_perm else "❌"
-        text += f"{status} {perm_name}\n"
-        
-        action = "0" if has_perm else "1"  # Toggle
-        btn_action = "❌ O'chirish" if has_perm else "✅ Yoqish"
-        btn_text = f"{btn_action}: {perm_name.split()[1]}"
-        builder.button(
-            text=btn_text,
-            callback_data=f"admin_perm_toggle:{user_id}:{perm_key}:{action}"
-        )
-    
-    builder.button(text="🔙 Orqaga", callback_data="admin_permissions_select")
-    builder.adjust(1)
-    
+    text, markup = _build_perm_view(user_id, username, admin_info)
+
     if callback.message:
         try:
-            await callback.message.edit_text(text, reply_markup=builder.as_markup(), parse_mode="HTML")
+            await callback.message.edit_text(text, reply_markup=markup, parse_mode="HTML")
         except TelegramBadRequest as e:
             logging.warning(f"Failed to edit permission manage message: {e}")
 
 
-@admin_router.callback_query(F.data.startswith("admin_perm_toggle:"))
-async def admin_perm_toggle_callback(callback: CallbackQuery) -> None:
+@admin_router.callback_query(PermToggleCB.filter())
+async def admin_perm_toggle_callback(callback: CallbackQuery, callback_data: PermToggleCB) -> None:
     """Toggle a specific permission for an admin."""
-    if not await _ensure_admin(callback):
+    if not await _ensure_admin_cb(callback):
         return
-    if not _is_main_admin(callback.from_user.id if callback.from_user else 0):
+    if not _is_main_admin(_uid(callback)):
         await callback.answer("Faqat asosiy admin huquqlarni o'zgartira oladi.", show_alert=True)
         return
-    
-    parts = callback.data.split(":")
-    user_id = int(parts[1])
-    permission = parts[2]
-    new_value = parts[3] == "1"
-    
-    # Permission names in Uzbek for alert
-    perm_names_alert = {
-        'can_manage_users': 'Foydalanuvchilarni boshqarish',
-        'can_manage_channels': 'Kanallarni boshqarish',
-        'can_broadcast': 'Xabar yuborish',
-        'can_view_stats': 'Statistikani korish',
-        'can_manage_admins': 'Adminlarni boshqarish'
-    }
-    
-    perm_name = perm_names_alert.get(permission, permission)
+
+    user_id = callback_data.user_id
+    permission = callback_data.permission
+    new_value = callback_data.action == 1
+
+    perm_name = PERM_NAMES_ALERT.get(permission, permission)
     
     # Update permission
-    db.update_admin_permission(user_id, permission, new_value)
-    db.add_log(
+    await _db(db.update_admin_permission, user_id, permission, new_value)
+    db.add_log_async(
         callback.from_user.id if callback.from_user else None,
         f"admin_perm_update:{user_id}:{permission}:{new_value}"
     )
@@ -1846,47 +2018,42 @@ async def admin_perm_toggle_callback(callback: CallbackQuery) -> None:
     alert_text = f"{status_emoji} {perm_name}\n\n{status_text}"
     await callback.answer(alert_text, show_alert=True)
     
-    # Get updated admin info
-    admins = db.get_admins()
-    admin_info = next((a for a in admins if a.get("user_id") == user_id), None)
+    # Get updated admin info (row includes the permission flags)
+    admin_info = await _db(db.get_admin_with_permissions, user_id)
     if not admin_info:
         return
-    
+
     username = admin_info.get("username") or str(user_id)
-    perms = db.get_admin_permissions(user_id)
-    
-    # Permission names in Uzbek for display
-    perm_names = {
-        'can_manage_users': '👥 Foydalanuvchilarni boshqarish',
-        'can_manage_channels': '📢 Kanallarni boshqarish',
-        'can_broadcast': '📨 Xabar yuborish',
-        'can_view_stats': '📊 Statistikani korish',
-        'can_manage_admins': '👑 Adminlarni boshqarish'
-    }
-    
-    text = f"⚙️ <b>Huquqlar: {username}</b>\n\n"
-    
-    builder = InlineKeyboardBuilder()
-    for perm_key, perm_name_full in perm_names.items():
-        has_perm = perms.get(perm_key, 0) == 1
-        status = "✅" if has_perm else "❌"
-        text += f"{status} {perm_name_full}\n"
-        
-        action = "0" if has_perm else "1"  # Toggle
-        btn_action = "❌ O'chirish" if has_perm else "✅ Yoqish"
-        btn_text = f"{btn_action}: {perm_name_full.split()[1]}"
-        builder.button(
-            text=btn_text,
-            callback_data=f"admin_perm_toggle:{user_id}:{perm_key}:{action}"
-        )
-    
-    builder.button(text="🔙 Orqaga", callback_data="admin_permissions_select")
-    builder.adjust(1)
-    
+    text, markup = _build_perm_view(user_id, username, admin_info)
+
     # Update the message with new permissions state
     if callback.message:
         try:
-            await callback.message.edit_text(text, reply_markup=builder.as_markup(), parse_mode="HTML")
+            await callback.message.edit_text(text, reply_markup=markup, parse_mode="HTML")
         except TelegramBadRequest:
             pass
 
+
+
+TEXT_HANDLERS.update(
+    {
+        "📊 Statistika": admin_show_stats,
+        "🔗 Ulashish tugmasi": admin_share_button_menu,
+        "🗓 Oylik foydalanuvchilar": admin_monthly_users,
+        "📢 Kanal boshqaruvi": admin_manage_channels_text,
+        "👥 Adminlar": admin_manage_admins,
+        "👑 Admin boshqaruvi": admin_manage_admins,
+        "📝 Start xabarini tahrirlash": admin_edit_start_text,
+        "📨 Xabar yuborish": admin_broadcast_entry,
+        "📂 Backup": admin_backup,
+        "🕒 Uptime": admin_uptime,
+        "🔙 Ortga": admin_back,
+        "🧪 Test": admin_test_functions,
+    }
+)
+_TEXT_HANDLER_EXTRAS.update(
+    {
+        label: frozenset(inspect.signature(handler).parameters) - {"message"}
+        for label, handler in TEXT_HANDLERS.items()
+    }
+)
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import html
 import logging
 import re
@@ -10,6 +11,7 @@ from aiogram.exceptions import TelegramBadRequest, TelegramEntityTooLarge
 from aiogram.filters import Command
 from aiogram.types import (
     CallbackQuery,
+    ChatMemberUpdated,
     FSInputFile,
     InlineKeyboardButton,
     InlineKeyboardMarkup,
@@ -19,11 +21,13 @@ from aiogram.types import (
 
 from database.core import (
     DEFAULT_SETTINGS,
-    add_log,
+    add_log_async,
     add_or_update_user,
     get_channels,
     get_setting,
+    get_settings_many,
     increment_downloads,
+    set_channel_member,
     update_last_active,
 )
 from keyboards.common import subscription_keyboard
@@ -32,19 +36,53 @@ from utils.download import (
     SUPPORTED_DOMAINS,
     cleanup_file,
     download_video,
-    is_supported_url,
 )
 from utils.subscription import ensure_user_subscription
 
 user_router = Router(name="user")
 
+
+async def _db(fn, *args, **kwargs):
+    """Run a blocking database helper off the event loop."""
+    return await asyncio.to_thread(fn, *args, **kwargs)
+
+
 SUPPORTED_DOMAINS_PATTERN = "|".join(map(re.escape, SUPPORTED_DOMAINS))
+# Anchored on the host so the supported domain must terminate it; a match
+# already guarantees the URL is supported, no second validation pass needed.
 SUPPORTED_URL_RE = re.compile(
-    rf"https?://[^\s]*({SUPPORTED_DOMAINS_PATTERN})[^\s]*",
-    flags=re.IGNORECASE,
+    rf"https?://(?:[\w-]+\.)*(?:{SUPPORTED_DOMAINS_PATTERN})(?![\w-]|\.[\w-])(?:/[^\s]*)?",
+    flags=re.IGNORECASE | re.ASCII,
 )
 
 
+# Bot identity never changes while the process runs; fetch it once and
+# keep the caption-ready escaped display form alongside.
+_bot_info_cache: Optional[TelegramUser] = None
+_bot_display_cache: Optional[str] = None
+
+
+async def _get_bot_info(bot: Bot) -> TelegramUser:
+    global _bot_info_cache
+    if _bot_info_cache is None:
+        _bot_info_cache = await bot.get_me()
+    return _bot_info_cache
+
+
+async def _get_bot_display(bot: Bot) -> str:
+    global _bot_display_cache
+    if _bot_display_cache is None:
+        bot_info = await _get_bot_info(bot)
+        bot_username = bot_info.username or bot_info.full_name
+        raw = (
+            f"@{bot_username}"
+            if bot_username and not bot_username.startswith("@")
+            else bot_username
+        )
+        _bot_display_cache = html.escape(raw) if raw else ""
+    return _bot_display_cache
+
+
 @user_router.message(Command("start"))
 async def handle_start(message: Message, bot: Bot) -> None:
     """Send welcome text and enforce subscription requirements."""
@@ -52,19 +90,19 @@ async def handle_start(message: Message, bot: Bot) -> None:
         return
 
     user = message.from_user
-    add_or_update_user(user.id, user.username, user.first_name)
+    await _db(add_or_update_user, user.id, user.username, user.first_name)
 
     allowed, missing = await ensure_user_subscription(bot, user.id)
     if not allowed:
         prompt = get_setting("subscribe_text", DEFAULT_SETTINGS["subscribe_text"])
-        keyboard = subscription_keyboard(missing if missing else get_channels())
+        keyboard = subscription_keyboard(missing if missing else await _db(get_channels))
         await message.answer(prompt, reply_markup=keyboard)
-        add_log(user.id, "subscription_prompt")
+        add_log_async(user.id, "subscription_prompt")
         return
 
     welcome = get_setting("start_text", DEFAULT_SETTINGS["start_text"])
     await message.answer(welcome)
-    add_log(user.id, "start_command")
+    add_log_async(user.id, "start_command")
 
 
 @user_router.callback_query(F.data == "check_subscription")
@@ -80,18 +118,42 @@ async def process_subscription_check(callback: CallbackQuery, bot: Bot) -> None:
         if callback.message:
             await callback.message.edit_text(text)
         await callback.answer("Rahmat! Obuna tasdiqlandi.")
-        add_log(user.id, "subscription_confirmed")
+        add_log_async(user.id, "subscription_confirmed")
     else:
-        add_log(user.id, "subscription_pending")
-    await callback.answer("⚠️ Kanalga a'zo bo'lmagansiz.", show_alert=True)
+        await callback.answer("⚠️ Kanalga a'zo bo'lmagansiz.", show_alert=True)
+        add_log_async(user.id, "subscription_pending")
+
+
+# Statuses Telegram uses for someone who is inside the chat.
+_MEMBER_STATUSES = frozenset({"member", "administrator", "creator", "restricted"})
+
+
+@user_router.chat_member()
+async def handle_chat_member_update(event: ChatMemberUpdated) -> None:
+    """Record join/leave pushes so subscription checks can skip the API."""
+    channel_id = str(event.chat.id)
+    if not any(channel["channel_id"] == channel_id for channel in await _db(get_channels)):
+        return
+    is_member = event.new_chat_member.status in _MEMBER_STATUSES
+    await _db(set_channel_member, channel_id, event.new_chat_member.user.id, is_member)
+
+
+# Async so the dispatcher runs them inline (sync callables get pushed
+# to a worker thread per update).
+async def _text_has_supported_url(message: Message) -> bool:
+    return _extract_supported_url(message.text) is not None
+
 
+async def _caption_has_supported_url(message: Message) -> bool:
+    return _extract_supported_url(message.caption) is not None
 
-@user_router.message(F.text.regexp(SUPPORTED_URL_RE))
+
+@user_router.message(_text_has_supported_url)
 async def handle_text_video_request(message: Message, bot: Bot) -> None:
     await _process_download(message, bot, message.text)
 
 
-@user_router.message(F.caption.regexp(SUPPORTED_URL_RE))
+@user_router.message(_caption_has_supported_url)
 async def handle_media_caption_request(message: Message, bot: Bot) -> None:
     await _process_download(message, bot, message.caption)
 
@@ -110,12 +172,12 @@ async def _process_download(message: Message, bot: Bot, text: Optional[str]) ->
         return
 
     user = message.from_user
-    add_or_update_user(user.id, user.username, user.first_name)
+    await _db(add_or_update_user, user.id, user.username, user.first_name)
 
     allowed, missing = await ensure_user_subscription(bot, user.id)
     if not allowed:
         prompt = get_setting("subscribe_text", DEFAULT_SETTINGS["subscribe_text"])
-        keyboard = subscription_keyboard(missing if missing else get_channels())
+        keyboard = subscription_keyboard(missing if missing else await _db(get_channels))
         await message.answer(prompt, reply_markup=keyboard)
         return
 
@@ -125,12 +187,18 @@ async def _process_download(message: Message, bot: Bot, text: Optional[str]) ->
 
     status = await message.answer("⏳ Yuklab olinmoqda, biroz kuting...")
     try:
-        result = await download_video(url)
-        bot_info = await bot.get_me()
-        bot_username = bot_info.username or bot_info.full_name
-        caption = _build_caption(result.title, result.duration, user, bot_username)
-
-        file_size = result.file_path.stat().st_size
+        # Fetch the bot identity while the download runs; both are
+        # independent network waits.
+        bot_display_task = asyncio.ensure_future(_get_bot_display(bot))
+        try:
+            result = await download_video(url)
+        except BaseException:
+            bot_display_task.cancel()
+            raise
+        bot_display = await bot_display_task
+        caption = _build_caption(result.title, result.duration, user, bot_display)
+
+        file_size = (await asyncio.to_thread(result.file_path.stat)).st_size
         max_size_bytes = 50 * 1024 * 1024  # Telegram bot limits
         if file_size > max_size_bytes:
             size_mb = file_size / (1024 * 1024)
@@ -138,38 +206,39 @@ async def _process_download(message: Message, bot: Bot, text: Optional[str]) ->
                 "Video hajmi {size:.1f} MB. Telegram botlarida 50 MB dan katta fayllarni yuborib bo'lmaydi."
                 .format(size=size_mb)
             )
-            add_log(user.id, f"file_too_large:{url}")
+            add_log_async(user.id, f"file_too_large:{url}")
             return
 
         sent_message: Optional[Message] = None
 
+        # One input file for all branches; aiogram streams it to Telegram
+        # in 64KB chunks instead of buffering the whole file.
+        media = FSInputFile(result.file_path, filename=result.file_path.name)
+
         try:
             if result.media_type == "photo":
-                photo = FSInputFile(result.file_path)
                 sent_message = await message.answer_photo(
-                    photo,
+                    media,
                     caption=caption,
                 )
+            elif result.ext.lower() == "mp4":
+                sent_message = await message.answer_video(
+                    media,
+                    caption=caption,
+                    supports_streaming=True,
+                )
             else:
-                video = FSInputFile(result.file_path)
-                if result.ext.lower() == "mp4":
-                    sent_message = await message.answer_video(
-                        video,
-                        caption=caption,
-                        supports_streaming=True,
-                    )
-                else:
-                    sent_message = await message.answer_document(
-                        video,
-                        caption=caption,
-                    )
+                sent_message = await message.answer_document(
+                    media,
+                    caption=caption,
+                )
         except TelegramEntityTooLarge:
             size_mb = file_size / (1024 * 1024)
             await status.edit_text(
                 "Video hajmi {size:.1f} MB ekan. Telegram botlarida 50 MB dan katta fayllarni yuborib bo'lmaydi."
                 .format(size=size_mb)
             )
-            add_log(user.id, f"file_too_large:{url}")
+            add_log_async(user.id, f"file_too_large:{url}")
             return
 
         share_markup = _build_share_keyboard()
@@ -179,9 +248,9 @@ async def _process_download(message: Message, bot: Bot, text: Optional[str]) ->
             except TelegramBadRequest:
                 logging.debug("Share markupni qo'shib bo'lmadi", exc_info=True)
         
-        increment_downloads(user.id)
-        update_last_active(user.id)
-        add_log(user.id, f"download:{url}")
+        await _db(increment_downloads, user.id)
+        await _db(update_last_active, user.id)
+        add_log_async(user.id, f"download:{url}")
     except DownloadError as error:
         await status.edit_text(str(error))
     except TelegramBadRequest as error:
@@ -203,25 +272,24 @@ async def _process_download(message: Message, bot: Bot, text: Optional[str]) ->
 def _extract_supported_url(text: Optional[str]) -> Optional[str]:
     if not text:
         return None
-    for match in SUPPORTED_URL_RE.finditer(text):
-        candidate = match.group(0)
-        if is_supported_url(candidate):
-            return candidate
-    return None
+    # C-level substring prefilter: most messages carry no link at all,
+    # so skip the regex unless a supported domain appears somewhere.
+    lowered = text.lower()
+    if not any(domain in lowered for domain in SUPPORTED_DOMAINS):
+        return None
+    match = SUPPORTED_URL_RE.search(text)
+    return match.group(0) if match else None
 
 
 def _build_caption(
     title: str,
     duration: Optional[float],
     user: TelegramUser,
-    bot_username: str,
+    bot_display: str,
 ) -> str:
+    """Compose the media caption; bot_display arrives already escaped."""
     safe_title = html.escape(title)
     user_display = _format_user(user)
-    bot_display_raw = (
-        f"@{bot_username}" if bot_username and not bot_username.startswith("@") else bot_username
-    )
-    bot_display = html.escape(bot_display_raw) if bot_display_raw else ""
 
     parts = [f"🎬 <b>{safe_title}</b>"]
     if duration:
@@ -233,28 +301,28 @@ def _build_caption(
     return "\n".join(parts)
 
 
+_TRUTHY = frozenset({"1", "true", "ha", "yes", "on", "enabled"})
+
+
 def _is_truthy(value: Optional[str]) -> bool:
     if value is None:
         return False
-    return str(value).strip().lower() in {"1", "true", "ha", "yes", "on", "enabled"}
+    return str(value).strip().lower() in _TRUTHY
+
+
+_SHARE_BUTTON_KEYS = ("share_button_enabled", "share_button_text", "share_button_url")
 
 
 def _build_share_keyboard() -> Optional[InlineKeyboardMarkup]:
-    enabled_raw = get_setting(
-        "share_button_enabled",
-        DEFAULT_SETTINGS.get("share_button_enabled", "1"),
-    )
-    if not _is_truthy(enabled_raw):
+    values = {
+        key: value if value is not None else DEFAULT_SETTINGS.get(key)
+        for key, value in get_settings_many(_SHARE_BUTTON_KEYS).items()
+    }
+    if not _is_truthy(values["share_button_enabled"]):
         return None
 
-    text_value = get_setting(
-        "share_button_text",
-        DEFAULT_SETTINGS.get("share_button_text", "♻️ Do'stlarga ulashish"),
-    )
-    url_value = get_setting(
-        "share_button_url",
-        DEFAULT_SETTINGS.get("share_button_url", ""),
-    )
+    text_value = values["share_button_text"]
+    url_value = values["share_button_url"]
 
     button_text = (text_value or "").strip() or DEFAULT_SETTINGS.get(
         "share_button_text", "♻️ Do'stlarga ulashish"
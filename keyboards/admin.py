@@ -1,7 +1,13 @@
+from functools import cache, lru_cache
+
 from aiogram.types import InlineKeyboardMarkup, ReplyKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder, ReplyKeyboardBuilder
 
+# Markups are immutable values once built, so fixed layouts are cached
+# instead of re-running the builders on every handler invocation.
+
 
+@cache
 def admin_main_reply_kb() -> ReplyKeyboardMarkup:
     """Return nicely arranged reply keyboard for admin panel."""
     builder = ReplyKeyboardBuilder()
@@ -17,32 +23,45 @@ def admin_main_reply_kb() -> ReplyKeyboardMarkup:
 
 def channels_management_kb(channels: list[dict]) -> InlineKeyboardMarkup:
     """Build inline keyboard for managing subscription channels."""
+    return _channels_management_kb()
+
+
+@cache
+def _channels_management_kb() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
-    
+
     # Add main channel management buttons
     builder.button(text="❌ Obunani o'chirish", callback_data="admin_disable_subscription")
     builder.button(text="📋 Kanallar ro'yxati", callback_data="admin_channels_list")
     builder.button(text="➕ Kanal qo'shish", callback_data="admin_channel_add")
     builder.button(text="🗑️ Kanal o'chirish", callback_data="admin_channel_delete")
     builder.button(text="📝 Obuna xabarini tahrirlash", callback_data="admin_edit_subscription_text")
-    
+
     builder.adjust(2, 2, 1)
     return builder.as_markup()
 
 
 def channels_list_kb(channels: list[dict]) -> InlineKeyboardMarkup:
     """Build inline keyboard showing list of channels for deletion."""
+    return _channels_list_kb(
+        tuple(
+            (channel["channel_id"], channel.get("title") or channel.get("link"))
+            for channel in channels
+        )
+    )
+
+
+@lru_cache(maxsize=32)
+def _channels_list_kb(entries: tuple[tuple[str, str], ...]) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
-    if channels:
-        for channel in channels:
-            label = channel.get("title") or channel.get("link")
-            # Truncate long labels
-            if len(label) > 25:
-                label = label[:22] + "..."
-            builder.button(
-                text=f"❌ {label}",
-                callback_data=f"admin_channel_remove:{channel['channel_id']}",
-            )
+    for channel_id, label in entries:
+        # Truncate long labels
+        if len(label) > 25:
+            label = label[:22] + "..."
+        builder.button(
+            text=f"❌ {label}",
+            callback_data=f"admin_channel_remove:{channel_id}",
+        )
     builder.button(text="🔙 Orqaga", callback_data="admin_channels_back")
     builder.adjust(1)
     return builder.as_markup()
@@ -65,6 +84,7 @@ def admins_management_kb(admins: list[dict], can_manage: bool) -> InlineKeyboard
     return builder.as_markup()
 
 
+@lru_cache(maxsize=16)
 def confirm_keyboard(yes_callback: str, no_callback: str) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.button(text="✅ Ha", callback_data=yes_callback)
@@ -74,6 +94,10 @@ def confirm_keyboard(yes_callback: str, no_callback: str) -> InlineKeyboardMarku
 
 
 def share_button_settings_kb(enabled: bool) -> InlineKeyboardMarkup:
+    return _SHARE_KB_ON if enabled else _SHARE_KB_OFF
+
+
+def _share_button_settings_kb(enabled: bool) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     toggle_text = "✅ Tugmani o'chirish" if enabled else "▶️ Tugmani yoqish"
     builder.button(text=toggle_text, callback_data="admin_share_toggle")
@@ -82,3 +106,7 @@ def share_button_settings_kb(enabled: bool) -> InlineKeyboardMarkup:
     builder.button(text="🔙 Orqaga", callback_data="admin_share_back")
     builder.adjust(1)
     return builder.as_markup()
+
+
+_SHARE_KB_ON = _share_button_settings_kb(True)
+_SHARE_KB_OFF = _share_button_settings_kb(False)
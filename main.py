@@ -6,13 +6,14 @@ from aiogram import Bot, Dispatcher
 from aiogram.client.bot import DefaultBotProperties
 from aiogram.fsm.storage.memory import MemoryStorage
 
-from database.core import add_admin, ensure_database
+from database.core import add_admin, ensure_database, log_worker
 from handlers import admin as admin_handlers
 from handlers import user as user_handlers
 from utils.config import get_settings
+from utils.download import close_http_session
 from utils.logger import setup_logging
+from utils.subscription import listen_channel_invalidations
 from utils.system import mark_bot_started
-from utils.profile import periodic_profile_updates
 
 
 def register_routers(dispatcher: Dispatcher) -> None:
@@ -35,18 +36,29 @@ async def main() -> None:
         token=settings.bot_token,
         default=DefaultBotProperties(parse_mode="HTML"),
     )
-    storage = MemoryStorage()
+    if settings.redis_url:
+        # Shared FSM state lets several bot workers run side by side.
+        from aiogram.fsm.storage.redis import RedisStorage
+
+        storage = RedisStorage.from_url(settings.redis_url)
+    else:
+        storage = MemoryStorage()
     dispatcher = Dispatcher(storage=storage)
     register_routers(dispatcher)
 
     logging.info("Bot ishga tushmoqda...")
-    profile_task = asyncio.create_task(periodic_profile_updates(bot))
+    log_task = asyncio.create_task(log_worker())
+    # No-op without REDIS_URL; with Redis it mirrors channel-list edits
+    # from sibling workers into this process's cache.
+    invalidation_task = asyncio.create_task(listen_channel_invalidations())
     try:
         await dispatcher.start_polling(bot)
     finally:
-        profile_task.cancel()
-        with contextlib.suppress(asyncio.CancelledError):
-            await profile_task
+        for task in (log_task, invalidation_task):
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        await close_http_session()
 
 
 if __name__ == "__main__":
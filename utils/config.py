@@ -12,9 +12,11 @@ class Settings(BaseSettings):
     bot_token: str = Field(..., env="BOT_TOKEN")
     main_admin_id: int = Field(..., env="MAIN_ADMIN_ID")
     database_path: Path = Field(default=BASE_DIR / "data" / "bot.db")
+    redis_url: Optional[str] = Field(default=None, env="REDIS_URL")
     download_proxy: Optional[str] = Field(default=None, env="DOWNLOAD_PROXY")
     download_socket_timeout: int = Field(default=25, env="DOWNLOAD_SOCKET_TIMEOUT")
     download_retries: int = Field(default=3, env="DOWNLOAD_RETRIES")
+    download_max_workers: int = Field(default=4, env="DOWNLOAD_MAX_WORKERS")
     download_user_agent: str = Field(
         default=(
             "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
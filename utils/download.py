@@ -5,19 +5,31 @@ import html
 import json
 import logging
 import re
-import time
 import uuid
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, NamedTuple, Optional
 from urllib.parse import parse_qs, urlparse
 
-import ffmpeg
-import requests
-import yt_dlp
+import aiofiles
+import aiohttp
 
 from utils.config import get_settings
 
+try:
+    # 2-4x tezroq C parser; katta __NEXT_DATA__ bloblari uchun sezilarli.
+    from orjson import loads as _json_loads
+except ImportError:  # pragma: no cover
+    _json_loads = json.loads
+
+try:
+    # libxml2 C parser: butun sahifa bitta parse bilan o'qiladi va markup
+    # o'zgarishlariga regexdan chidamliroq.
+    from lxml import html as _lxml_html
+except ImportError:  # pragma: no cover
+    _lxml_html = None
+
 DOWNLOAD_DIR = Path("downloads")
 OUTPUT_TEMPLATE = str(DOWNLOAD_DIR / "%(id)s.%(ext)s")
 INSTAGRAM_DOMAINS = ("instagram.com", "instagr.am")
@@ -51,6 +63,18 @@ LIKEE_REQUEST_TIMEOUT = 20
 
 _settings = get_settings()
 
+# yt-dlp extractions each hold ~20-50 MB and real CPU, so they run on a
+# small dedicated pool instead of the loop's default executor, which
+# would happily start dozens side by side under load.
+_YTDLP_EXECUTOR = ThreadPoolExecutor(
+    max_workers=max(1, _settings.download_max_workers),
+    thread_name_prefix="ytdlp",
+)
+
+# ffmpeg forks its own process and eats whole cores; two at a time is
+# plenty for this bot and keeps a transcode storm off the CPU.
+_FFMPEG_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ffmpeg")
+
 INSTAGRAM_HEADERS = {
     "User-Agent": _settings.download_user_agent,
     "Accept": "application/json",
@@ -73,19 +97,84 @@ LIKEE_PAGE_HEADERS = {
 
 _META_TAG_RE = re.compile(r"<meta\s+[^>]+>", re.IGNORECASE)
 _ATTR_RE = re.compile(r"([a-zA-Z_:]+)\s*=\s*\"([^\"]*)\"")
+_VIDEO_URL_JSON_RE = re.compile(r'"video_url"\s*:\s*"(.*?)"')
+_SSSTIK_TT_TOKEN_RE = re.compile(r'id="tt"\s+value="([^"]+)"')
+_SSSTIK_NOWM_RE = re.compile(
+    r'<a[^>]+href="([^"\s]+)"[^>]*class="[^"]*without_watermark[^"]*"',
+    re.IGNORECASE,
+)
+_SSSTIK_URL_RE = re.compile(r'(https?://[^"\s]+)')
+_SSSTIK_TITLE_RE = re.compile(r'class="[^"]*download-title[^"]*"[^>]*>(.*?)</p>', re.DOTALL)
+_HTML_TAG_RE = re.compile(r"<.*?>")
+# Bitta alternation bilan __NEXT_DATA__ va entry_data skriptlari bir
+# o'tishda topiladi; ilgari har biri sahifani alohida skanerlar edi.
+_INSTAGRAM_JSON_SCRIPTS_RE = re.compile(
+    r'<script type="application/json"[^>]*?'
+    r'(?:id="__NEXT_DATA__"[^>]*>(?P<next>.*?)|>(?P<entry>\{"require_login".*?))'
+    r'</script>',
+    re.DOTALL,
+)
+
+
+def _parse_html_doc(markup: str):
+    """Parse markup with lxml when installed; None means use the regex fallback."""
+    if _lxml_html is None or not markup:
+        return None
+    try:
+        return _lxml_html.fromstring(markup)
+    except Exception:
+        logging.debug("lxml HTML parse muvaffaqiyatsiz, regexga qaytiladi")
+        return None
+
+
+# One shared aiohttp session for all media hosts: connections are pooled
+# and kept alive, so the event loop overlaps every HTTP hop directly
+# instead of burning a worker thread per blocking request.
+_http_session: Optional[aiohttp.ClientSession] = None
+_http_session_lock = asyncio.Lock()
+
+
+async def _get_http_session() -> aiohttp.ClientSession:
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        async with _http_session_lock:
+            if _http_session is None or _http_session.closed:
+                _http_session = aiohttp.ClientSession(
+                    # Per-host cap keeps album fan-outs from starving other
+                    # services; cached DNS answers skip a resolver round
+                    # trip on every reconnect.
+                    connector=aiohttp.TCPConnector(
+                        limit=64,
+                        limit_per_host=16,
+                        ttl_dns_cache=300,
+                        keepalive_timeout=60,
+                    ),
+                    headers={"User-Agent": _settings.download_user_agent},
+                )
+    return _http_session
+
+
+async def close_http_session() -> None:
+    """Close the shared HTTP session on bot shutdown."""
+    global _http_session
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+    _http_session = None
 
 
 class DownloadError(RuntimeError):
     """Raised when media download fails."""
 
 
-@dataclass(slots=True)
-class DownloadResult:
+class DownloadResult(NamedTuple):
     file_path: Path
     title: str
     duration: Optional[float]
     ext: str
     media_type: str = "video"  # "video" yoki "photo"
+    # Codec allaqachon tekshirilgan/tuzatilgan bo'lsa, keyingi
+    # ensure_playable bosqichi ffmpeg'ni qayta ishga tushirmaydi.
+    already_playable: bool = False
 
 
 def _extract_meta_content(page_html: str, keys: tuple[str, ...]) -> Optional[str]:
@@ -111,34 +200,92 @@ def _decode_json_string(value: str) -> str:
             return value
 
 
-def is_supported_url(url: str) -> bool:
-    lowered = url.lower()
-    return any(domain in lowered for domain in SUPPORTED_DOMAINS)
+# Every supported domain mapped to its service once at import, so a URL
+# is classified with a single parse + hash lookup instead of five
+# urlparse calls and linear domain scans per request.
+_DOMAIN_GROUPS = (
+    (INSTAGRAM_DOMAINS, "instagram"),
+    (TIKTOK_DOMAINS, "tiktok"),
+    (SNAPCHAT_DOMAINS, "snapchat"),
+    (LIKEE_DOMAINS, "likee"),
+    (YOUTUBE_DOMAINS, "youtube"),
+)
+_URL_KIND_BY_DOMAIN: dict[str, str] = {
+    domain: kind for domains, kind in _DOMAIN_GROUPS for domain in domains
+}
+# Subdomain fallback as one anchored automaton: the winning named group
+# is the service, so cache misses cost a single C-level match instead of
+# a Python loop over every dotted suffix.
+_HOST_KIND_RE = re.compile(
+    r"(?:^|\.)(?:"
+    + "|".join(
+        f"(?P<{kind}>" + "|".join(re.escape(domain) for domain in domains) + ")"
+        for domains, kind in _DOMAIN_GROUPS
+    )
+    + r")$"
+)
+
+
+@lru_cache(maxsize=1024)
+def _classify_url(url: str) -> str:
+    """Return the service a URL belongs to, or "other"."""
+    host = urlparse(url).hostname or ""
+    kind = _URL_KIND_BY_DOMAIN.get(host)
+    if kind:
+        return kind
+    match = _HOST_KIND_RE.search(host)
+    return match.lastgroup if match else "other"
 
 
 def _is_instagram_url(url: str) -> bool:
-    host = urlparse(url).netloc.lower()
-    return any(domain in host for domain in INSTAGRAM_DOMAINS)
+    return _classify_url(url) == "instagram"
 
 
 def _is_tiktok_url(url: str) -> bool:
-    host = urlparse(url).netloc.lower()
-    return any(domain in host for domain in TIKTOK_DOMAINS)
+    return _classify_url(url) == "tiktok"
 
 
 def _is_snapchat_url(url: str) -> bool:
-    host = urlparse(url).netloc.lower()
-    return any(domain in host for domain in SNAPCHAT_DOMAINS)
+    return _classify_url(url) == "snapchat"
 
 
 def _is_likee_url(url: str) -> bool:
-    host = urlparse(url).netloc.lower()
-    return any(domain in host for domain in LIKEE_DOMAINS)
+    return _classify_url(url) == "likee"
 
 
 def _is_youtube_url(url: str) -> bool:
-    host = urlparse(url).netloc.lower()
-    return any(domain in host for domain in YOUTUBE_DOMAINS)
+    return _classify_url(url) == "youtube"
+
+
+def is_supported_url(url: str) -> bool:
+    return _classify_url(url) != "other"
+
+
+# yt-dlp opsiyalarining o'zgarmas qismi bir marta quriladi; har bir
+# chaqiruvda faqat sozlamaga bog'liq maydonlar ustiga yoziladi.
+_BASE_YDL_OPTS: dict[str, Any] = {
+    "outtmpl": OUTPUT_TEMPLATE,
+    "noprogress": True,
+    "quiet": True,
+    "writesubtitles": False,
+    "writeautomaticsub": False,
+    "nocheckcertificate": True,
+    "geo_bypass": True,
+    # Asl formatni saqlagan holda, avvalo Telegram bilan mos keladigan
+    # H264 oqimlarini tanlashga urinadi
+    "format": (
+        "bestvideo[ext=mp4][vcodec~=avc]+bestaudio[ext=m4a]/"
+        "bestvideo[ext=mp4]+bestaudio[ext=m4a]/"
+        "bestvideo*+bestaudio/best"
+    ),
+}
+_REFERER_BY_KIND = {
+    "instagram": "https://www.instagram.com/",
+    "youtube": "https://www.youtube.com/",
+    "snapchat": "https://story.snapchat.com/",
+    "likee": "https://www.likee.video/",
+    "tiktok": "https://www.tiktok.com/",
+}
 
 
 async def download_video(url: str) -> DownloadResult:
@@ -148,7 +295,7 @@ async def download_video(url: str) -> DownloadResult:
     if _is_instagram_url(url):
         # Likee kabi tez HTML meta tag parse qilish
         try:
-            return await asyncio.to_thread(_download_instagram_via_meta, url)
+            return await _download_instagram_via_meta(url)
         except DownloadError as error:
             logging.info("Instagram meta tag ishlamadi, yt-dlp ga o'tilmoqda: %s", error)
             return await _download_with_ytdlp(url, ensure_playable=False)
@@ -161,7 +308,7 @@ async def download_video(url: str) -> DownloadResult:
 
     if _is_likee_url(url):
         try:
-            return await asyncio.to_thread(_download_likee_media, url)
+            return await _download_likee_media(url)
         except DownloadError as error:
             logging.info("Likee sahifasi to'g'ridan-to'g'ri olinmadi, yt-dlp sinab ko'riladi: %s", error)
             return await _download_with_ytdlp(url, ensure_playable=False)
@@ -184,77 +331,40 @@ def _normalize_remote_url(raw_url: str, base: str) -> str:
 
 
 async def _download_with_ytdlp(url: str, *, ensure_playable: bool = False) -> DownloadResult:
-    def _worker() -> DownloadResult:
-        retries = max(1, _settings.download_retries)
-        socket_timeout = max(10, _settings.download_socket_timeout)
-
-        is_instagram = _is_instagram_url(url)
-        is_youtube = _is_youtube_url(url)
-        is_snapchat = _is_snapchat_url(url)
-        is_likee = _is_likee_url(url)
-
-        ydl_opts = {
-            "outtmpl": OUTPUT_TEMPLATE,
-            "noprogress": True,
-            "quiet": True,
-            "writesubtitles": False,
-            "writeautomaticsub": False,
-            "nocheckcertificate": True,
-            "socket_timeout": float(socket_timeout),
-            "retries": retries,
-            "fragment_retries": retries,
-            "geo_bypass": True,
-            "http_headers": {
-                "User-Agent": _settings.download_user_agent,
-                "Referer": (
-                    "https://www.instagram.com/"
-                    if is_instagram
-                    else "https://www.youtube.com/"
-                    if is_youtube
-                    else "https://story.snapchat.com/"
-                    if is_snapchat
-                    else "https://www.likee.video/"
-                    if is_likee
-                    else "https://www.tiktok.com/"
-                ),
-                "Accept-Language": "en-US,en;q=0.9",
-            },
-        }
-        
-        # Asl formatni saqlagan holda, avvalo Telegram bilan mos keladigan H264 oqimlarini tanlashga urinadi
-        ydl_opts["format"] = (
-            "bestvideo[ext=mp4][vcodec~=avc]+bestaudio[ext=m4a]/"
-            "bestvideo[ext=mp4]+bestaudio[ext=m4a]/"
-            "bestvideo*+bestaudio/best"
-        )
+    # Kechiktirilgan import: yt-dlp o'nlab MB RSS oladi, shuning uchun
+    # faqat birinchi yuklashda yuklanadi.
+    import yt_dlp
+
+    retries = max(1, _settings.download_retries)
+    socket_timeout = max(10, _settings.download_socket_timeout)
+
+    kind = _classify_url(url)
+    ydl_opts: dict[str, Any] = {
+        **_BASE_YDL_OPTS,
+        "socket_timeout": float(socket_timeout),
+        "retries": retries,
+        "fragment_retries": retries,
+        "http_headers": {
+            "User-Agent": _settings.download_user_agent,
+            "Referer": _REFERER_BY_KIND.get(kind, _REFERER_BY_KIND["tiktok"]),
+            "Accept-Language": "en-US,en;q=0.9",
+        },
+    }
 
-        if _settings.download_proxy:
-            ydl_opts["proxy"] = _settings.download_proxy
+    if _settings.download_proxy:
+        ydl_opts["proxy"] = _settings.download_proxy
 
+    def _attempt() -> DownloadResult:
+        # Bitta urinish, uxlamaydi: backoff tashqarida await bilan bo'ladi,
+        # shunda pool ipi kutish davrida boshqa yuklashlarga bo'shaydi.
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info: Optional[dict[str, Any]] = None
-            last_error: Optional[yt_dlp.utils.DownloadError] = None  # type: ignore[attr-defined]
-            for attempt in range(1, retries + 1):
-                try:
-                    logging.info("yt-dlp yuklash boshlandi: %s", url)
-                    info = ydl.extract_info(url, download=True)
-                    logging.info("yt-dlp muvaffaqiyatli: info keys = %s", list(info.keys()) if info else None)
-                    break
-                except yt_dlp.utils.DownloadError as exc:  # type: ignore[attr-defined]
-                    last_error = exc
-                    logging.warning(
-                        "Yuklab olish urinish %s/%s muvaffaqiyatsiz: %s",
-                        attempt,
-                        retries,
-                        exc,
-                    )
-                    if attempt >= retries:
-                        raise
-                    time.sleep(min(2 ** attempt, 10))
+            logging.info("yt-dlp yuklash boshlandi: %s", url)
+            info: Optional[dict[str, Any]] = ydl.extract_info(url, download=True)
+            logging.info("yt-dlp muvaffaqiyatli: info keys = %s", list(info.keys()) if info else None)
 
             if info is None:
-                raise DownloadError("Media haqida ma'lumot olinmadi.") from last_error
-            
+                raise DownloadError("Media haqida ma'lumot olinmadi.")
+
             # Instagram playlist (bir necha rasm) uchun maxsus ishlov
             if info.get("_type") == "playlist":
                 entries = info.get("entries", [])
@@ -287,19 +397,16 @@ async def _download_with_ytdlp(url: str, *, ensure_playable: bool = False) -> Do
             
             output = Path(ydl.prepare_filename(info))
             
-            # Turli file extensionlarni tekshirish
+            # Haqiqiy kengaytma bitta readdir bilan topiladi (ilgari har
+            # bir nomzod kengaytma alohida stat chaqiruvi edi); bir nechta
+            # fayl chiqsa mp4 birinchi o'rinda turadi.
             if not output.exists():
-                # Avval mp4 ni tekshirish
-                candidate = output.with_suffix(".mp4")
-                if candidate.exists():
-                    output = candidate
-                else:
-                    # Boshqa formatlari: jpg, jpeg, png, webp
-                    for ext in [".jpg", ".jpeg", ".png", ".webp", ".mkv", ".webm"]:
-                        candidate = output.with_suffix(ext)
-                        if candidate.exists():
-                            output = candidate
-                            break
+                candidates = sorted(
+                    DOWNLOAD_DIR.glob(f"{output.stem}.*"),
+                    key=lambda path: (path.suffix.lower() != ".mp4", path.suffix.lower()),
+                )
+                if candidates:
+                    output = candidates[0]
             
             if not output.exists():
                 # Download papkasidagi barcha fayllarni ko'rsatish (debug uchun)
@@ -314,6 +421,7 @@ async def _download_with_ytdlp(url: str, *, ensure_playable: bool = False) -> Do
             # Media turini aniqlash
             media_type = "photo" if output.suffix.lstrip(".") in ("jpg", "jpeg", "png", "webp") else "video"
 
+            already_playable = False
             if media_type == "video":
                 video_codec = _detect_video_codec(info)
                 if video_codec and not _is_telegram_friendly_codec(video_codec):
@@ -322,26 +430,46 @@ async def _download_with_ytdlp(url: str, *, ensure_playable: bool = False) -> Do
                         video_codec,
                     )
                     output = _ensure_playable_mp4(output)
-            
+                    already_playable = True
+                elif video_codec:
+                    already_playable = True
+
             return DownloadResult(
                 file_path=output,
                 title=info.get("title", "Instagram media"),
                 duration=info.get("duration"),
                 ext=output.suffix.lstrip("."),
                 media_type=media_type,
+                already_playable=already_playable,
             )
 
     try:
-        result = await asyncio.to_thread(_worker)
-        if ensure_playable and result.media_type == "video":
-            final_path = await asyncio.to_thread(_ensure_playable_mp4, result.file_path)
+        loop = asyncio.get_running_loop()
+        result: Optional[DownloadResult] = None
+        for attempt in range(1, retries + 1):
+            try:
+                result = await loop.run_in_executor(_YTDLP_EXECUTOR, _attempt)
+                break
+            except yt_dlp.utils.DownloadError as exc:  # type: ignore[attr-defined]
+                logging.warning(
+                    "Yuklab olish urinish %s/%s muvaffaqiyatsiz: %s",
+                    attempt,
+                    retries,
+                    exc,
+                )
+                if attempt >= retries:
+                    raise
+                await asyncio.sleep(min(2 ** attempt, 10))
+        assert result is not None
+        if ensure_playable and result.media_type == "video" and not result.already_playable:
+            final_path = await loop.run_in_executor(
+                _FFMPEG_EXECUTOR, _ensure_playable_mp4, result.file_path
+            )
             if final_path != result.file_path:
-                result = DownloadResult(
+                result = result._replace(
                     file_path=final_path,
-                    title=result.title,
-                    duration=result.duration,
                     ext=final_path.suffix.lstrip("."),
-                    media_type=result.media_type,
+                    already_playable=True,
                 )
         return result
     except yt_dlp.utils.DownloadError as error:  # type: ignore[attr-defined]
@@ -358,7 +486,7 @@ async def _download_with_ytdlp(url: str, *, ensure_playable: bool = False) -> Do
 
 async def _download_tiktok_media(url: str) -> DownloadResult:
     try:
-        result = await asyncio.to_thread(_download_tiktok_via_ssstik, url)
+        result = await _download_tiktok_via_ssstik(url)
         logging.info("TikTok video ssstik orqali yuklandi")
         return result
     except DownloadError as error:
@@ -366,36 +494,38 @@ async def _download_tiktok_media(url: str) -> DownloadResult:
         raise
 
 
-def _download_likee_media(url: str) -> DownloadResult:
-    session = requests.Session()
-    session.headers.update(LIKEE_PAGE_HEADERS)
+async def _download_likee_media(url: str) -> DownloadResult:
+    session = await _get_http_session()
 
     try:
-        response = session.get(url, timeout=LIKEE_REQUEST_TIMEOUT, allow_redirects=True)
-    except requests.RequestException as error:
-        logging.exception("Likee sahifasini olishda xato", exc_info=error)
-        raise DownloadError("Likee videosini olishda xato yuz berdi.") from error
+        async with session.get(
+            url,
+            headers=LIKEE_PAGE_HEADERS,
+            timeout=aiohttp.ClientTimeout(total=LIKEE_REQUEST_TIMEOUT),
+        ) as response:
+            if response.status == 404:
+                raise DownloadError("Likee havolasi topilmadi yoki o'chirilgan.")
 
-    if response.status_code == 404:
-        raise DownloadError("Likee havolasi topilmadi yoki o'chirilgan.")
+            if not response.ok:
+                logging.warning("Likee sahifasi status kodi: %s", response.status)
+                raise DownloadError("Likee videosini olishda xato yuz berdi.")
 
-    if not response.ok:
-        logging.warning("Likee sahifasi status kodi: %s", response.status_code)
-        raise DownloadError("Likee videosini olishda xato yuz berdi.")
+            referer_url = str(response.url)
+            page_html = await response.text()
+    except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+        logging.exception("Likee sahifasini olishda xato", exc_info=error)
+        raise DownloadError("Likee videosini olishda xato yuz berdi.") from error
 
-    referer_url = response.url
     final_url = referer_url.rstrip("/")
     if final_url.lower() in {"https://likee.video", "https://www.likee.video", "https://like.video", "https://www.like.video"}:
         raise DownloadError("Likee havolasi yaroqsiz yoki video o'chirilgan.")
 
-    page_html = response.text
-
     video_url = _extract_meta_content(
         page_html,
         ("og:video:secure_url", "og:video:url", "og:video"),
     )
     if not video_url:
-        match = re.search(r'"video_url"\s*:\s*"(.*?)"', page_html)
+        match = _VIDEO_URL_JSON_RE.search(page_html)
         if match:
             video_url = _decode_json_string(match.group(1))
     if not video_url:
@@ -420,7 +550,7 @@ def _download_likee_media(url: str) -> DownloadResult:
 
     file_path = DOWNLOAD_DIR / f"{uuid.uuid4().hex}.mp4"
 
-    _download_file_from_url(video_url, file_path, headers=download_headers, timeout=40)
+    await _download_file_from_url(video_url, file_path, headers=download_headers, timeout=40)
 
     try:
         if file_path.stat().st_size < 64 * 1024:
@@ -437,25 +567,28 @@ def _download_likee_media(url: str) -> DownloadResult:
     )
 
 
-def _download_tiktok_via_ssstik(url: str) -> DownloadResult:
-    session = requests.Session()
-    session.headers.update({
-        "User-Agent": _settings.download_user_agent,
-        "Accept-Language": "en-US,en;q=0.9",
-    })
+async def _download_tiktok_via_ssstik(url: str) -> DownloadResult:
+    session = await _get_http_session()
+    base_headers = {"Accept-Language": "en-US,en;q=0.9"}
 
     try:
-        landing = session.get("https://ssstik.io/", timeout=20)
-        landing.raise_for_status()
-    except requests.RequestException as error:
+        async with session.get(
+            "https://ssstik.io/",
+            headers=base_headers,
+            timeout=aiohttp.ClientTimeout(total=20),
+        ) as landing:
+            landing.raise_for_status()
+            landing_text = await landing.text()
+    except (aiohttp.ClientError, asyncio.TimeoutError) as error:
         logging.exception("SSStik sahifasiga ulanishda xato", exc_info=error)
         raise DownloadError("TikTok videosini olishda xato yuz berdi.") from error
 
-    token_match = re.search(r'id="tt"\s+value="([^"]+)"', landing.text)
+    token_match = _SSSTIK_TT_TOKEN_RE.search(landing_text)
     token = token_match.group(1) if token_match else ""
 
     payload = {"id": url, "locale": "en", "tt": token}
     headers = {
+        **base_headers,
         "Referer": "https://ssstik.io/",
         "X-Requested-With": "XMLHttpRequest",
         "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
@@ -463,21 +596,27 @@ def _download_tiktok_via_ssstik(url: str) -> DownloadResult:
     }
 
     try:
-        response = session.post("https://ssstik.io/abc?url=dl", data=payload, headers=headers, timeout=30)
-        response.raise_for_status()
-    except requests.RequestException as error:
+        async with session.post(
+            "https://ssstik.io/abc?url=dl",
+            data=payload,
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=30),
+        ) as response:
+            response.raise_for_status()
+            response_text = await response.text()
+    except (aiohttp.ClientError, asyncio.TimeoutError) as error:
         logging.exception("SSStik API bilan bog'lanib bo'lmadi", exc_info=error)
         raise DownloadError("TikTok videosini olishda xato yuz berdi.") from error
 
     status: Optional[str] = None
     html_block = ""
     try:
-        payload_data = response.json()
+        payload_data = _json_loads(response_text)
         if isinstance(payload_data, dict):
             status = str(payload_data.get("status", "")).lower() or None
             html_block = payload_data.get("data") or payload_data.get("result") or ""
     except ValueError:
-        html_block = response.text
+        html_block = response_text
 
     if status and status not in {"ok", "success"}:
         raise DownloadError("TikTok videosini olishda xato yuz berdi.")
@@ -486,15 +625,23 @@ def _download_tiktok_via_ssstik(url: str) -> DownloadResult:
         raise DownloadError("TikTok videosini olishda xato yuz berdi.")
 
     video_url: Optional[str] = None
-    link_match = re.search(
-        r'<a[^>]+href="([^"\s]+)"[^>]*class="[^"]*without_watermark[^"]*"',
-        html_block,
-        re.IGNORECASE,
-    )
-    if link_match:
-        video_url = link_match.group(1)
+    title = "TikTok video"
+
+    doc = _parse_html_doc(html_block)
+    if doc is not None:
+        hrefs = doc.xpath('//a[contains(@class, "without_watermark")]/@href')
+        if hrefs:
+            video_url = hrefs[0]
+        doc_title = doc.xpath('string(//*[contains(@class, "download-title")])').strip()
+        if doc_title:
+            title = doc_title
+
     if not video_url:
-        video_match = re.search(r'(https?://[^"\s]+)', html_block)
+        link_match = _SSSTIK_NOWM_RE.search(html_block)
+        if link_match:
+            video_url = link_match.group(1)
+    if not video_url:
+        video_match = _SSSTIK_URL_RE.search(html_block)
         if video_match:
             video_url = video_match.group(1)
     if not video_url:
@@ -502,18 +649,17 @@ def _download_tiktok_via_ssstik(url: str) -> DownloadResult:
 
     video_url = _normalize_remote_url(html.unescape(video_url), "https://ssstik.io")
 
-    title_pattern = r'class="[^"]*download-title[^"]*"[^>]*>(.*?)</p>'
-    title_match = re.search(title_pattern, html_block, re.DOTALL)
-    title = "TikTok video"
-    if title_match:
-        raw_title = re.sub(r"<.*?>", "", title_match.group(1)).strip()
-        if raw_title:
-            title = html.unescape(raw_title)
+    if doc is None:
+        title_match = _SSSTIK_TITLE_RE.search(html_block)
+        if title_match:
+            raw_title = _HTML_TAG_RE.sub("", title_match.group(1)).strip()
+            if raw_title:
+                title = html.unescape(raw_title)
 
     file_id = uuid.uuid4().hex
     file_path = DOWNLOAD_DIR / f"{file_id}.mp4"
 
-    _download_file_from_url(
+    await _download_file_from_url(
         video_url,
         file_path,
         headers={"User-Agent": _settings.download_user_agent, "Referer": "https://ssstik.io/"},
@@ -535,12 +681,15 @@ def _download_tiktok_via_ssstik(url: str) -> DownloadResult:
     )
 
 
-def _download_instagram_media(url: str) -> DownloadResult:
+async def _resolve_instagram_nodes(
+    url: str,
+) -> tuple[str, Optional[int], str, list[dict[str, Any]]]:
+    """Fetch post metadata and return (shortcode, requested_index, title, nodes)."""
     shortcode, media_type, requested_index = _extract_instagram_shortcode(url)
     if not shortcode:
         raise DownloadError("Instagram havolasini tushunib bo'lmadi.")
 
-    payload = _fetch_instagram_payload(shortcode, media_type)
+    payload = await _fetch_instagram_payload(shortcode, media_type)
 
     media = (payload.get("graphql") or {}).get("shortcode_media")
     if not media:
@@ -563,28 +712,27 @@ def _download_instagram_media(url: str) -> DownloadResult:
     if not nodes:
         raise DownloadError("Post tarkibida media topilmadi.")
 
-    index = 0
-    if requested_index is not None:
-        if 1 <= requested_index <= len(nodes):
-            index = requested_index - 1
-        else:
-            logging.info(
-                "Instagram img_index=%s diapazondan tashqarida, mavjud media soni=%s. Birinchi element olinadi.",
-                requested_index,
-                len(nodes),
-            )
-
-    node = nodes[index]
     title = _extract_instagram_caption(media) or f"Instagram {shortcode}"
+    return shortcode, requested_index, title, nodes
+
+
+async def _download_instagram_node(
+    node: dict[str, Any],
+    title: str,
+    shortcode: str,
+    index: int,
+    total: int,
+) -> DownloadResult:
+    """Download one post node (video or photo) to its own file."""
+    suffix = f"_{index + 1}" if total > 1 else ""
 
     if node.get("is_video") and node.get("video_url"):
         video_url = node["video_url"]
-        duration_raw = node.get("video_duration") or media.get("video_duration")
+        duration_raw = node.get("video_duration")
         duration = float(duration_raw) if duration_raw else None
         ext = Path(urlparse(video_url).path).suffix.lstrip(".") or "mp4"
-        suffix = f"_{index + 1}" if len(nodes) > 1 else ""
         file_path = DOWNLOAD_DIR / f"{shortcode}{suffix}.{ext}"
-        _download_file_from_url(
+        await _download_file_from_url(
             video_url,
             file_path,
             headers=INSTAGRAM_HEADERS,
@@ -607,9 +755,8 @@ def _download_instagram_media(url: str) -> DownloadResult:
         raise DownloadError("Postda rasm topilmadi.")
 
     ext = Path(urlparse(image_url).path).suffix.lstrip(".") or "jpg"
-    suffix = f"_{index + 1}" if len(nodes) > 1 else ""
     file_path = DOWNLOAD_DIR / f"{shortcode}{suffix}.{ext}"
-    _download_file_from_url(
+    await _download_file_from_url(
         image_url,
         file_path,
         headers=INSTAGRAM_HEADERS,
@@ -623,6 +770,49 @@ def _download_instagram_media(url: str) -> DownloadResult:
         ext=ext,
         media_type="photo",
     )
+
+
+async def _download_instagram_media(url: str) -> DownloadResult:
+    shortcode, requested_index, title, nodes = await _resolve_instagram_nodes(url)
+
+    index = 0
+    if requested_index is not None:
+        if 1 <= requested_index <= len(nodes):
+            index = requested_index - 1
+        else:
+            logging.info(
+                "Instagram img_index=%s diapazondan tashqarida, mavjud media soni=%s. Birinchi element olinadi.",
+                requested_index,
+                len(nodes),
+            )
+
+    # Video davomiyligi ba'zan faqat asosiy media yozuvida bo'ladi.
+    node = nodes[index]
+    if node.get("is_video") and not node.get("video_duration") and nodes[0].get("video_duration"):
+        node = {**node, "video_duration": nodes[0]["video_duration"]}
+    return await _download_instagram_node(node, title, shortcode, index, len(nodes))
+
+
+async def download_instagram_album(url: str) -> list[DownloadResult]:
+    """Download every node of a post; sidecar nodes fetch concurrently."""
+    shortcode, requested_index, title, nodes = await _resolve_instagram_nodes(url)
+
+    if requested_index is not None or len(nodes) == 1:
+        return [await _download_instagram_media(url)]
+
+    # I/O-bound fan-out: cap parallel fetches so one album can't hog
+    # the shared connection pool.
+    semaphore = asyncio.Semaphore(5)
+
+    async def _bounded(node: dict[str, Any], index: int) -> DownloadResult:
+        async with semaphore:
+            return await _download_instagram_node(node, title, shortcode, index, len(nodes))
+
+    return list(
+        await asyncio.gather(*(_bounded(node, index) for index, node in enumerate(nodes)))
+    )
+
+
 def _extract_instagram_shortcode(url: str) -> tuple[Optional[str], str, Optional[int]]:
     parsed = urlparse(url)
     parts = [segment for segment in parsed.path.split("/") if segment]
@@ -647,87 +837,97 @@ def _extract_instagram_shortcode(url: str) -> tuple[Optional[str], str, Optional
     return shortcode or None, media_type, index
 
 
-def _fetch_instagram_payload(shortcode: str, media_type: str) -> dict:
+async def _fetch_instagram_payload(shortcode: str, media_type: str) -> dict:
     endpoint = f"https://www.instagram.com/{media_type}/{shortcode}/"
     params = {"__a": "1", "__d": "dis"}
+    session = await _get_http_session()
 
     try:
-        response = requests.get(
+        async with session.get(
             endpoint,
             params=params,
             headers=INSTAGRAM_HEADERS,
-            timeout=INSTAGRAM_REQUEST_TIMEOUT,
-        )
-    except requests.RequestException as error:
+            timeout=aiohttp.ClientTimeout(total=INSTAGRAM_REQUEST_TIMEOUT),
+        ) as response:
+            status_code = response.status
+            if response.ok:
+                try:
+                    data = await response.json(content_type=None)
+                except ValueError as error:
+                    logging.debug("Instagram JSON javobi o'qilmadi, HTML fallback ishlatiladi.", exc_info=error)
+                else:
+                    if isinstance(data, dict) and (data.get("graphql") or data.get("items")):
+                        return data
+                    logging.debug("Instagram JSON javobi kutilgan formatda emas, HTML fallback.")
+    except (aiohttp.ClientError, asyncio.TimeoutError) as error:
         logging.exception("Instagram bilan bog'lanishda xato", exc_info=error)
         raise DownloadError("Instagram bilan bog'lanib bo'lmadi.") from error
 
-    if response.ok:
-        try:
-            data = response.json()
-        except ValueError as error:
-            logging.debug("Instagram JSON javobi o'qilmadi, HTML fallback ishlatiladi.", exc_info=error)
-        else:
-            if data.get("graphql") or data.get("items"):
-                return data
-            logging.debug("Instagram JSON javobi kutilgan formatda emas, HTML fallback.")
-
     logging.info(
         "Instagram JSON endpoint status %s, HTML fallback sinab ko'riladi.",
-        response.status_code,
+        status_code,
     )
 
-    return _fetch_instagram_payload_from_html(endpoint)
+    return await _fetch_instagram_payload_from_html(endpoint)
 
 
-def _fetch_instagram_payload_from_html(page_url: str) -> dict:
+async def _fetch_instagram_payload_from_html(page_url: str) -> dict:
+    session = await _get_http_session()
     try:
-        response = requests.get(
+        async with session.get(
             page_url,
             headers={
                 **INSTAGRAM_HEADERS,
                 "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
             },
-            timeout=INSTAGRAM_REQUEST_TIMEOUT,
-        )
-    except requests.RequestException as error:
-        logging.exception("Instagram HTML sahifasini olishda xato", exc_info=error)
-        raise DownloadError("Instagram ma'lumotlarini olishda xato yuz berdi.") from error
+            timeout=aiohttp.ClientTimeout(total=INSTAGRAM_REQUEST_TIMEOUT),
+        ) as response:
+            if response.status == 404:
+                raise DownloadError("Instagram havolasi topilmadi yoki o'chirilgan.")
 
-    if response.status_code == 404:
-        raise DownloadError("Instagram havolasi topilmadi yoki o'chirilgan.")
+            if not response.ok:
+                logging.warning("Instagram HTML status kodi: %s", response.status)
+                raise DownloadError("Instagram ma'lumotlarini olishda xato yuz berdi.")
 
-    if not response.ok:
-        logging.warning("Instagram HTML status kodi: %s", response.status_code)
-        raise DownloadError("Instagram ma'lumotlarini olishda xato yuz berdi.")
+            html = await response.text()
+    except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+        logging.exception("Instagram HTML sahifasini olishda xato", exc_info=error)
+        raise DownloadError("Instagram ma'lumotlarini olishda xato yuz berdi.") from error
 
-    html = response.text
+    # lxml bor bo'lsa __NEXT_DATA__ skripti bitta DOM parse bilan topiladi;
+    # bo'lmasa yoki natija chiqmasa quyidagi regex skaneri ishlaydi.
+    doc = _parse_html_doc(html)
+    if doc is not None:
+        for json_text in doc.xpath('//script[@id="__NEXT_DATA__"]/text()'):
+            try:
+                data = _json_loads(json_text)
+            except json.JSONDecodeError:
+                logging.debug("__NEXT_DATA__ JSON parselanmadi")
+                continue
+            graphql = data.get("props", {}).get("pageProps", {}).get("graphql")
+            if graphql and (graphql.get("shortcode_media") or graphql.get("reel")):
+                return {"graphql": graphql}
 
-    # __NEXT_DATA__ ga asoslangan layout
-    match = re.search(
-        r'<script type="application/json"[^>]*id="__NEXT_DATA__"[^>]*>(.*?)</script>',
-        html,
-        re.DOTALL,
-    )
-    if match:
-        json_text = match.group(1)
+    # __NEXT_DATA__ va eski entry_data layoutlari bitta skanerda yig'iladi;
+    # entry nomzodlari __NEXT_DATA__ natija bermagandagina parse qilinadi.
+    entry_candidates: list[str] = []
+    for script_match in _INSTAGRAM_JSON_SCRIPTS_RE.finditer(html):
+        json_text = script_match.group("next")
+        if json_text is None:
+            entry_candidates.append(script_match.group("entry"))
+            continue
         try:
-            data = json.loads(json_text)
+            data = _json_loads(json_text)
         except json.JSONDecodeError:
             logging.debug("__NEXT_DATA__ JSON parselanmadi")
-        else:
-            graphql = data.get("props", {}).get("pageProps", {}).get("graphql")
-            if graphql and (graphql.get("shortcode_media") or graphql.get("reel")):
-                return {"graphql": graphql}
+            continue
+        graphql = data.get("props", {}).get("pageProps", {}).get("graphql")
+        if graphql and (graphql.get("shortcode_media") or graphql.get("reel")):
+            return {"graphql": graphql}
 
-    # Eski (entry_data) layout uchun
-    for script_match in re.finditer(
-        r'<script type="application/json"[^>]*>({"require_login".*?})</script>',
-        html,
-        re.DOTALL,
-    ):
+    for candidate in entry_candidates:
         try:
-            data = json.loads(script_match.group(1))
+            data = _json_loads(candidate)
         except json.JSONDecodeError:
             continue
         entry_data = data.get("entry_data", {})
@@ -752,26 +952,28 @@ def _extract_instagram_caption(media: dict) -> str:
     return alt_text
 
 
-def _download_file_from_url(
+async def _download_file_from_url(
     source_url: str,
     destination: Path,
     *,
     headers: Optional[dict[str, str]] = None,
     timeout: int = INSTAGRAM_REQUEST_TIMEOUT,
 ) -> None:
+    session = await _get_http_session()
     try:
-        with requests.get(
+        async with session.get(
             source_url,
             headers=headers or {"User-Agent": _settings.download_user_agent},
-            stream=True,
-            timeout=timeout,
+            # Per-read timeout, not total: large files legitimately take long.
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout),
         ) as response:
             response.raise_for_status()
-            with destination.open("wb") as file:
-                for chunk in response.iter_content(chunk_size=64 * 1024):
-                    if chunk:
-                        file.write(chunk)
-    except requests.RequestException as error:
+            async with aiofiles.open(destination, "wb") as file:
+                # 1 MiB chunks: far fewer write() syscalls and loop
+                # wakeups per downloaded megabyte than the old 64 KB.
+                async for chunk in response.content.iter_chunked(1 << 20):
+                    await file.write(chunk)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as error:
         if destination.exists():
             try:
                 destination.unlink()
@@ -812,8 +1014,36 @@ def _is_telegram_friendly_codec(codec: str) -> bool:
     return lowered.startswith("avc") or lowered.startswith("h264")
 
 
+_MP4_MAJOR_BRANDS = (b"isom", b"iso2", b"mp41", b"mp42", b"avc1", b"M4V ")
+
+
+def _sniff_mp4_codec(path: Path) -> Optional[str]:
+    """Detect an H.264 MP4 from the file head without forking ffprobe.
+
+    Faststart fayllarda moov (va avc1 sample tavsifi) boshida turadi, shuning
+    uchun 64 KB kifoya; aniqlanmasa None qaytadi va ffprobe hal qiladi.
+    """
+    try:
+        with path.open("rb") as file:
+            head = file.read(64 * 1024)
+    except OSError:
+        return None
+    if len(head) < 12 or head[4:8] != b"ftyp":
+        return None
+    if head[8:12] not in _MP4_MAJOR_BRANDS:
+        return None
+    if b"avc1" in head[12:] or b"avc3" in head[12:]:
+        return "h264"
+    return None
+
+
 def _ensure_playable_mp4(path: Path) -> Path:
     """Ensure the downloaded file is an MP4 optimized for Telegram streaming."""
+    if path.suffix.lower() == ".mp4" and _sniff_mp4_codec(path) == "h264":
+        return path
+
+    import ffmpeg
+
     try:
         probe = ffmpeg.probe(str(path))
     except ffmpeg.Error as error:
@@ -823,28 +1053,43 @@ def _ensure_playable_mp4(path: Path) -> Path:
     audio_stream = _find_stream(probe, "audio")
     has_audio = bool(audio_stream and int(audio_stream.get("channels", 0)) > 0)
 
+    video_stream = _find_stream(probe, "video") or {}
+    codec = (video_stream.get("codec_name") or "").lower()
+    pix_fmt = (video_stream.get("pix_fmt") or "").lower()
+    if codec in {"h264", "avc1"} and pix_fmt == "yuv420p":
+        if path.suffix.lower() == ".mp4":
+            # Allaqachon Telegramga mos; libx264 bosqichi shart emas.
+            return path
+        # Oqimlar mos, faqat konteynerni almashtirish kifoya.
+        return _transcode_to_mp4(path, has_audio=has_audio, copy_video=True)
+
     return _transcode_to_mp4(path, has_audio=has_audio)
 
 
-def _transcode_to_mp4(path: Path, *, has_audio: bool) -> Path:
+def _transcode_to_mp4(path: Path, *, has_audio: bool, copy_video: bool = False) -> Path:
     target = path.with_suffix(".mp4")
     if target == path:
         target = path.with_name(path.stem + "_h264.mp4")
 
+    import ffmpeg
+
     logging.info("Videoni mp4 formatiga o'tkazilmoqda: %s -> %s", path, target)
     try:
         stream = ffmpeg.input(str(path))
-        output_args = {
-            "vcodec": "libx264",
-            "movflags": "+faststart",
-            "preset": "veryfast",
-            "crf": 23,
-            "pix_fmt": "yuv420p",
-            "profile:v": "baseline",
-            "level": "3.1",
-            "g": 48,
-            "vsync": "vfr",
-        }
+        if copy_video:
+            output_args = {"vcodec": "copy", "movflags": "+faststart"}
+        else:
+            output_args = {
+                "vcodec": "libx264",
+                "movflags": "+faststart",
+                "preset": "veryfast",
+                "crf": 23,
+                "pix_fmt": "yuv420p",
+                "profile:v": "baseline",
+                "level": "3.1",
+                "g": 48,
+                "vsync": "vfr",
+            }
         if has_audio:
             output_args.update({"acodec": "aac", "b:a": "128k", "ac": 2, "ar": 48000})
         else:
@@ -875,33 +1120,35 @@ def _find_stream(probe_data: dict, stream_type: str) -> Optional[dict]:
             return stream
     return None
 
-def _download_instagram_via_meta(url: str) -> DownloadResult:
+async def _download_instagram_via_meta(url: str) -> DownloadResult:
     """Instagram videoni Likee kabi tez meta tag orqali yuklash."""
-    session = requests.Session()
-    session.headers.update(INSTAGRAM_HEADERS)
+    session = await _get_http_session()
 
     try:
-        response = session.get(url, timeout=INSTAGRAM_REQUEST_TIMEOUT, allow_redirects=True)
-    except requests.RequestException as error:
-        logging.exception("Instagram sahifasini olishda xato", exc_info=error)
-        raise DownloadError("Instagram videosini olishda xato yuz berdi.") from error
-
-    if response.status_code == 404:
-        raise DownloadError("Instagram havolasi topilmadi yoki o'chirilgan.")
+        async with session.get(
+            url,
+            headers=INSTAGRAM_HEADERS,
+            timeout=aiohttp.ClientTimeout(total=INSTAGRAM_REQUEST_TIMEOUT),
+        ) as response:
+            if response.status == 404:
+                raise DownloadError("Instagram havolasi topilmadi yoki o'chirilgan.")
 
-    if not response.ok:
-        logging.warning("Instagram sahifasi status kodi: %s", response.status_code)
-        raise DownloadError("Instagram videosini olishda xato yuz berdi.")
+            if not response.ok:
+                logging.warning("Instagram sahifasi status kodi: %s", response.status)
+                raise DownloadError("Instagram videosini olishda xato yuz berdi.")
 
-    referer_url = response.url
-    page_html = response.text
+            referer_url = str(response.url)
+            page_html = await response.text()
+    except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+        logging.exception("Instagram sahifasini olishda xato", exc_info=error)
+        raise DownloadError("Instagram videosini olishda xato yuz berdi.") from error
 
     video_url = _extract_meta_content(
         page_html,
         ("og:video:secure_url", "og:video:url", "og:video"),
     )
     if not video_url:
-        match = re.search(r'"video_url"\s*:\s*"(.*?)"', page_html)
+        match = _VIDEO_URL_JSON_RE.search(page_html)
         if match:
             video_url = _decode_json_string(match.group(1))
     if not video_url:
@@ -926,7 +1173,7 @@ def _download_instagram_via_meta(url: str) -> DownloadResult:
 
     file_path = DOWNLOAD_DIR / f"{uuid.uuid4().hex}.mp4"
 
-    _download_file_from_url(video_url, file_path, headers=download_headers, timeout=40)
+    await _download_file_from_url(video_url, file_path, headers=download_headers, timeout=40)
 
     try:
         if file_path.stat().st_size < 64 * 1024:
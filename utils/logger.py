@@ -1,4 +1,7 @@
+import atexit
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
 
 LOG_FILE = Path("logs") / "bot.log"
@@ -7,11 +10,31 @@ LOG_FILE = Path("logs") / "bot.log"
 def setup_logging() -> None:
     """Configure application-wide logging handlers."""
     LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
-        handlers=[
-            logging.FileHandler(LOG_FILE, encoding="utf-8"),
-            logging.StreamHandler(),
-        ],
+
+    # Handlers run on a listener thread fed through an unbounded queue, so
+    # a log call on the event loop never blocks on file or console I/O.
+    file_handler = RotatingFileHandler(
+        LOG_FILE,
+        maxBytes=5_000_000,
+        backupCount=3,
+        encoding="utf-8",
+    )
+    listener = QueueListener(
+        queue.SimpleQueue(),
+        file_handler,
+        logging.StreamHandler(),
+        respect_handler_level=True,
     )
+    formatter = logging.Formatter("%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+    for handler in listener.handlers:
+        handler.setFormatter(formatter)
+
+    # basicConfig would attach its own formatter to the queue handler and
+    # pre-bake records before the listener formats them, so wire the root
+    # logger by hand.
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.handlers.clear()
+    root.addHandler(QueueHandler(listener.queue))
+    listener.start()
+    atexit.register(listener.stop)
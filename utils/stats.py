@@ -1,10 +1,10 @@
 from __future__ import annotations
 
+from collections import Counter
 from dataclasses import dataclass
+from datetime import date
 from typing import Dict, List
 
-import pandas as pd
-
 from database.core import get_user_counts, get_users_join_dates
 
 
@@ -36,15 +36,17 @@ def build_growth_chart(days: int = 14) -> str:
     if not records:
         return "So'nggi kunlarda yangi foydalanuvchilar qo'shilmagan."
 
-    frame = pd.DataFrame(records)
-    frame["join_day"] = pd.to_datetime(frame["join_day"])
-    grouped = frame.groupby(frame["join_day"].dt.date).size()
+    grouped: Counter = Counter()
+    for record in records:
+        join_day = record["join_day"]
+        day = date.fromisoformat(join_day) if isinstance(join_day, str) else join_day.date()
+        grouped[day] += int(record["count"])
 
     chart_lines: List[str] = []
-    max_value = grouped.max()
+    max_value = max(grouped.values())
     scale = max(1, max_value // 20)
 
-    for day, count in grouped.sort_index().items():
+    for day, count in sorted(grouped.items()):
         bars = "#" * max(1, count // scale)
         chart_lines.append(f"{day} | {bars} ({count})")
 
@@ -1,12 +1,83 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import logging
-from typing import Iterable, List, Tuple
+import time
+from collections import OrderedDict
+from typing import Any, List, Mapping, Optional, Sequence, Tuple
 
 from aiogram import Bot
 from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
 
-from database.core import get_channels, get_setting
+from database.core import (
+    get_channel_member_statuses,
+    get_channels,
+    get_setting,
+    get_subs_verification,
+    invalidate_channels_cache,
+    set_channel_members,
+    set_subs_verified,
+)
+from utils.config import get_settings
+from utils.throttle import throttled_get_chat_member
+
+logger = logging.getLogger(__name__)
+
+# Buzilgan kanal har bir foydalanuvchi tekshiruvida emas, daqiqada bir
+# marta logga yoziladi; LRU hajmi chegaralangan.
+_LOG_DEDUP_TTL = 60.0
+_LOG_DEDUP_MAX = 256
+_logged_channels: "OrderedDict[tuple[int, str], float]" = OrderedDict()
+
+
+def _log_once(level: int, msg: str, channel_id) -> None:
+    if not logger.isEnabledFor(level):
+        return
+    key = (level, str(channel_id))
+    now = time.monotonic()
+    last = _logged_channels.get(key)
+    if last is not None and now - last < _LOG_DEDUP_TTL:
+        return
+    _logged_channels[key] = now
+    _logged_channels.move_to_end(key)
+    while len(_logged_channels) > _LOG_DEDUP_MAX:
+        _logged_channels.popitem(last=False)
+    logger.log(level, msg, channel_id)
+
+
+# Telegram so'rovlarini tejash uchun obuna holati Redisda qisqa TTL
+# bilan saqlanadi (faqat REDIS_URL sozlanganda).
+_SUB_CACHE_OK_TTL = 180
+_SUB_CACHE_MISS_TTL = 30
+# Ijobiy tekshiruvdan keyin foydalanuvchiga shuncha soniya ishoniladi;
+# katta qiymat Telegram yukini kamaytiradi, kichigi kanaldan chiqqanni
+# tezroq sezadi.
+_SUBS_TRUST_WINDOW = 600
+
+_redis_client = None
+_redis_checked = False
+
+
+def _get_sub_cache():
+    global _redis_client, _redis_checked
+    if not _redis_checked:
+        _redis_checked = True
+        settings = get_settings()
+        if settings.redis_url:
+            from redis.asyncio import Redis
+
+            _redis_client = Redis.from_url(settings.redis_url)
+    return _redis_client
+
+
+def _channels_hash(channels: Sequence[Mapping[str, Any]]) -> str:
+    joined = ",".join(sorted(str(channel["channel_id"]) for channel in channels))
+    return hashlib.blake2b(joined.encode(), digest_size=8).hexdigest()
+
+
+# Built once: this check runs on every single update.
+_TRUTHY = frozenset({"1", "true", "ha", "enabled", "on", "yes"})
 
 
 def _is_subscription_required() -> bool:
@@ -15,31 +86,130 @@ def _is_subscription_required() -> bool:
         return True
     if isinstance(raw, bool):
         return raw
-    return str(raw).strip().lower() in {"1", "true", "ha", "enabled", "on", "yes"}
+    return str(raw).strip().lower() in _TRUTHY
+
+
+# Single-flight: tez ketma-ket ikki marta bosilgan tugma bitta Telegram
+# so'rovi bilan javob oladi.
+_inflight: dict[tuple[str, int], asyncio.Future] = {}
+
+
+async def _get_member(bot: Bot, channel_id: int | str, user_id: int):
+    key = (str(channel_id), user_id)
+    pending = _inflight.get(key)
+    if pending is not None:
+        return await pending
+    future: asyncio.Future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        # Rate limiter so'rovlarni Telegram limitlariga qarab navbatga
+        # qo'yadi, shuning uchun alohida fan-out cap kerak emas.
+        member = await throttled_get_chat_member(bot, channel_id, user_id)
+    except BaseException as error:
+        future.set_exception(error)
+        # Dublikat kutuvchi bo'lmasa ham "never retrieved" ogohlantirishi
+        # chiqmasligi uchun xato shu yerda o'qib qo'yiladi.
+        future.exception()
+        raise
+    else:
+        future.set_result(member)
+        return member
+    finally:
+        _inflight.pop(key, None)
 
 
 async def check_user_subscription(
     bot: Bot,
     user_id: int,
-    channels: Iterable[dict],
+    channels: Sequence[Mapping[str, Any]],
 ) -> Tuple[bool, List[dict]]:
     """Return subscription status and list of channels the user still needs to join."""
+    if not channels:
+        return True, []
+    # chat_member push yozuvlari: a'zoligi yozilgan kanallar uchun API
+    # so'ralmaydi; "chiqib ketgan" yoki noma'lum holatlar qayta tekshiriladi,
+    # shunda o'tkazib yuborilgan join hodisasi foydalanuvchini qulflamaydi.
+    known = await asyncio.to_thread(
+        get_channel_member_statuses,
+        user_id,
+        [channel["channel_id"] for channel in channels],
+    )
+    to_check = [
+        channel
+        for channel in channels
+        if known.get(str(channel["channel_id"])) is not True
+    ]
     missing: List[dict] = []
-    for channel in channels:
-        channel_id = channel["channel_id"]
-        try:
-            member = await bot.get_chat_member(channel_id, user_id)
-            if member.status in {"left", "kicked"}:
+    if to_check:
+        if len(to_check) == 1:
+            # Bitta majburiy kanal odatiy holat: gather/future mashinasisiz
+            # to'g'ridan-to'g'ri await qilinadi.
+            try:
+                results: List[object] = [
+                    await _get_member(bot, to_check[0]["channel_id"], user_id)
+                ]
+            except (TelegramForbiddenError, TelegramBadRequest) as error:
+                results = [error]
+        else:
+            # All membership round-trips overlap, so total latency is one
+            # RTT instead of one per required channel.
+            results = await asyncio.gather(
+                *(_get_member(bot, channel["channel_id"], user_id) for channel in to_check),
+                return_exceptions=True,
+            )
+        observed: List[tuple[str, int, bool]] = []
+        for channel, result in zip(to_check, results):
+            channel_id = channel["channel_id"]
+            if isinstance(result, TelegramForbiddenError):
+                _log_once(logging.WARNING, "Bot kanalga qo'shilmagan: %s", channel_id)
                 missing.append(channel)
-        except TelegramForbiddenError:
-            logging.warning("Bot kanalga qo'shilmagan: %s", channel_id)
-            missing.append(channel)
-        except TelegramBadRequest:
-            logging.error("Kanal topilmadi yoki kirish imkonsiz: %s", channel_id)
-            missing.append(channel)
+            elif isinstance(result, TelegramBadRequest):
+                _log_once(logging.ERROR, "Kanal topilmadi yoki kirish imkonsiz: %s", channel_id)
+                missing.append(channel)
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                is_member = result.status not in {"left", "kicked"}
+                observed.append((str(channel_id), user_id, is_member))
+                if not is_member:
+                    missing.append(channel)
+        if observed:
+            await asyncio.to_thread(set_channel_members, observed)
     return len(missing) == 0, missing
 
 
+_INVALIDATE_CHANNEL = "sub:invalidate"
+
+
+async def publish_channels_invalidated() -> None:
+    """Drop the local channel cache and tell sibling workers to do the same.
+
+    The Redis verdict keys and trust stamps embed the channel-list hash,
+    so they expire naturally; only the cached channel list itself needs
+    an explicit push.
+    """
+    invalidate_channels_cache()
+    cache = _get_sub_cache()
+    if cache is None:
+        return
+    try:
+        await cache.publish(_INVALIDATE_CHANNEL, "channels")
+    except Exception:
+        logger.debug("Invalidatsiya xabarini yuborib bo'lmadi", exc_info=True)
+
+
+async def listen_channel_invalidations() -> None:
+    """Background task dropping the channel cache on pub/sub messages."""
+    cache = _get_sub_cache()
+    if cache is None:
+        return
+    pubsub = cache.pubsub()
+    await pubsub.subscribe(_INVALIDATE_CHANNEL)
+    async for message in pubsub.listen():
+        if message.get("type") == "message":
+            invalidate_channels_cache()
+
+
 async def ensure_user_subscription(bot: Bot, user_id: int) -> Tuple[bool, List[dict]]:
     if not _is_subscription_required():
         return True, []
@@ -47,6 +217,53 @@ async def ensure_user_subscription(bot: Bot, user_id: int) -> Tuple[bool, List[d
     channels = get_channels()
     if not channels:
         return True, []
-    return await check_user_subscription(bot, user_id, channels)
+
+    channels_hash = _channels_hash(channels)
+    now = int(time.time())
+    verification = await asyncio.to_thread(get_subs_verification, user_id)
+    if verification is not None:
+        verified_until, verified_hash = verification
+        if now < verified_until and verified_hash == channels_hash:
+            return True, []
+
+    cache = _get_sub_cache()
+    cache_key: Optional[str] = None
+    if cache is not None:
+        cache_key = f"sub:{user_id}:{channels_hash}"
+        try:
+            cached = await cache.get(cache_key)
+        except Exception:
+            logger.debug("Obuna keshidan o'qib bo'lmadi", exc_info=True)
+            cached = None
+        if cached == b"ok":
+            return True, []
+        if cached is not None and cached.startswith(b"no:"):
+            missing_ids = set(cached[3:].decode().split(","))
+            missing = [
+                channel
+                for channel in channels
+                if str(channel["channel_id"]) in missing_ids
+            ]
+            if missing:
+                return False, missing
+
+    allowed, missing = await check_user_subscription(bot, user_id, channels)
+
+    if allowed:
+        await asyncio.to_thread(
+            set_subs_verified, user_id, now + _SUBS_TRUST_WINDOW, channels_hash
+        )
+
+    if cache_key is not None:
+        if allowed:
+            value, ttl = b"ok", _SUB_CACHE_OK_TTL
+        else:
+            joined = ",".join(str(channel["channel_id"]) for channel in missing)
+            value, ttl = b"no:" + joined.encode(), _SUB_CACHE_MISS_TTL
+        try:
+            await cache.set(cache_key, value, ex=ttl)
+        except Exception:
+            logger.debug("Obuna keshiga yozib bo'lmadi", exc_info=True)
+    return allowed, missing
 
 
@@ -1,30 +1,35 @@
 from __future__ import annotations
 
-from datetime import datetime, timezone
+import time
 
-BOT_START_TIME = datetime.now(timezone.utc)
+# Monotonic clock: immune to wall-clock jumps and needs no datetime or
+# timezone objects when formatting uptime.
+BOT_START_TIME = time.monotonic()
 
 
 def mark_bot_started() -> None:
     """Reset the bot start time marker."""
     global BOT_START_TIME
-    BOT_START_TIME = datetime.now(timezone.utc)
+    BOT_START_TIME = time.monotonic()
 
 
 def format_uptime() -> str:
     """Return human-readable uptime string in Uzbek."""
-    delta = datetime.now(timezone.utc) - BOT_START_TIME
-    days = delta.days
-    hours, remainder = divmod(delta.seconds, 3600)
-    minutes, seconds = divmod(remainder, 60)
+    total = int(time.monotonic() - BOT_START_TIME)
+    # Yangi ishga tushgan bot uchun eng tez-tez holat: ro'yxat va join
+    # mashinasisiz to'g'ridan-to'g'ri f-string qaytariladi.
+    if total < 60:
+        return f"{total} soniya"
 
-    parts: list[str] = []
-    if days:
-        parts.append(f"{days} kun")
-    if hours:
-        parts.append(f"{hours} soat")
-    if minutes:
-        parts.append(f"{minutes} daqiqa")
-    if not parts:
-        parts.append(f"{seconds} soniya")
-    return " ".join(parts)
+    days, remainder = divmod(total, 86400)
+    hours, remainder = divmod(remainder, 3600)
+    minutes, _ = divmod(remainder, 60)
+    return " ".join(
+        part
+        for part in (
+            f"{days} kun" if days else None,
+            f"{hours} soat" if hours else None,
+            f"{minutes} daqiqa" if minutes else None,
+        )
+        if part
+    )
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Union
+
+from aiogram import Bot
+from aiogram.types import ChatMember
+
+ChatId = Union[int, str]
+
+
+class AsyncRateLimiter:
+    """Minimal leaky-bucket limiter: at most max_rate entries per time_period.
+
+    Entering waits until capacity frees up; waiters queue FIFO behind the
+    lock, so bursts smooth out instead of tripping Telegram's RetryAfter.
+    """
+
+    def __init__(self, max_rate: int, time_period: float = 1.0) -> None:
+        self._max_rate = float(max_rate)
+        self._time_period = time_period
+        self._level = 0.0
+        self._last = 0.0
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self) -> "AsyncRateLimiter":
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            while True:
+                now = loop.time()
+                self._level = max(
+                    0.0,
+                    self._level - (now - self._last) * (self._max_rate / self._time_period),
+                )
+                self._last = now
+                if self._level + 1 <= self._max_rate:
+                    self._level += 1
+                    return self
+                await asyncio.sleep(
+                    (self._level + 1 - self._max_rate) * (self._time_period / self._max_rate)
+                )
+
+    async def __aexit__(self, *exc_info) -> None:
+        return None
+
+
+# Telegram umumiy limiti ~30 req/s — 29 bilan ozgina zaxira qoladi;
+# bitta chat uchun esa soniyasiga bitta so'rov yetarli.
+_overall_limiter = AsyncRateLimiter(29, 1.0)
+_per_chat_limiters: dict[str, AsyncRateLimiter] = {}
+
+
+def _chat_limiter(chat_id: ChatId) -> AsyncRateLimiter:
+    key = str(chat_id)
+    limiter = _per_chat_limiters.get(key)
+    if limiter is None:
+        limiter = _per_chat_limiters.setdefault(key, AsyncRateLimiter(1, 1.0))
+    return limiter
+
+
+async def throttled_get_chat_member(
+    bot: Bot, chat_id: ChatId, user_id: int
+) -> ChatMember:
+    """get_chat_member queued against the overall and per-chat rate limits."""
+    async with _overall_limiter, _chat_limiter(chat_id):
+        return await bot.get_chat_member(chat_id, user_id)